@@ -0,0 +1,77 @@
+from PySide6.QtCore import QRectF, QPointF
+from PySide6.QtWidgets import QGraphicsItem
+
+
+class DanMuCanvas(QGraphicsItem):
+    """
+    One scene item that owns and paints every active danmu. Each danmu is a
+    row in a set of parallel columns; positions for all of them are computed
+    in a single pass per frame from start time and velocity, and drawing is
+    a blit of a pre-rasterized pixmap. This avoids one QGraphicsTextItem and
+    one QPropertyAnimation per danmu.
+    """
+
+    def __init__(self, width, height, parent=None):
+        super().__init__(parent)
+        self.rect = QRectF(0, 0, width, height)
+        self.clear()
+
+    def __len__(self):
+        return len(self.pixmaps)
+
+    def clear(self):
+        self.pixmaps = []
+        self.start_x, self.start_y = [], []
+        self.velocity_x, self.velocity_y = [], []
+        self.start_time, self.end_time = [], []
+        self.positions = []
+        self.update()
+
+    def boundingRect(self):
+        return self.rect
+
+    def add(self, pixmap, start_pos, end_pos, start_time, duration_in_seconds):
+        duration_in_seconds = max(duration_in_seconds, 1e-3)
+        self.pixmaps.append(pixmap)
+        self.start_x.append(start_pos[0])
+        self.start_y.append(start_pos[1])
+        self.velocity_x.append((end_pos[0] - start_pos[0]) / duration_in_seconds)
+        self.velocity_y.append((end_pos[1] - start_pos[1]) / duration_in_seconds)
+        self.start_time.append(start_time)
+        self.end_time.append(start_time + duration_in_seconds)
+
+    def retime(self, now, ratio):
+        """Make every danmu move `ratio` times as fast from where it is at `now`."""
+        for i, t in enumerate(self.start_time):
+            self.start_x[i] += self.velocity_x[i] * (now - t)
+            self.start_y[i] += self.velocity_y[i] * (now - t)
+            self.velocity_x[i] *= ratio
+            self.velocity_y[i] *= ratio
+            self.start_time[i] = now
+            self.end_time[i] = now + (self.end_time[i] - now) / ratio
+
+    def in_flight(self, now):
+        """(x, y, width, velocity_x, end_time) of every danmu at `now`."""
+        for x, y, vx, t, end_time, pixmap in zip(
+            self.start_x, self.start_y, self.velocity_x, self.start_time, self.end_time, self.pixmaps
+        ):
+            yield x + vx * (now - t), y, pixmap.deviceIndependentSize().width(), vx, end_time
+
+    def advance_to(self, now):
+        """Drop finished danmu and compute every position for time `now`."""
+        if self.end_time and min(self.end_time) <= now:
+            alive = [i for i, end_time in enumerate(self.end_time) if end_time > now]
+            for name in ('pixmaps', 'start_x', 'start_y', 'velocity_x', 'velocity_y', 'start_time', 'end_time'):
+                column = getattr(self, name)
+                setattr(self, name, [column[i] for i in alive])
+
+        self.positions = [
+            QPointF(x + vx * (now - t), y + vy * (now - t))
+            for x, y, vx, vy, t in zip(self.start_x, self.start_y, self.velocity_x, self.velocity_y, self.start_time)
+        ]
+        self.update()
+
+    def paint(self, painter, option, widget=None):
+        draw = painter.drawPixmap
+        for position, pixmap in zip(self.positions, self.pixmaps):
+            draw(position, pixmap)
@@ -0,0 +1,99 @@
+# Clocks for DanMuMachine. A clock is a callable returning seconds.
+import time
+from abc import ABC, abstractmethod
+
+
+class Clock(ABC):
+    """Base class; subclasses implement now(), pause() and resume()."""
+    paused = False
+
+    @abstractmethod
+    def now(self):
+        """Current time in seconds."""
+
+    @abstractmethod
+    def pause(self):
+        """Stop the clock at its current reading."""
+
+    @abstractmethod
+    def resume(self):
+        """Continue from where pause() stopped."""
+
+    def __call__(self):
+        return self.now()
+
+
+class MonotonicClock(Clock):
+    """Wall time that never jumps backwards. It cannot be paused."""
+    def now(self):
+        return time.monotonic()
+
+    def pause(self):
+        raise TypeError('MonotonicClock cannot be paused, use PausableClock')
+
+    resume = pause
+
+
+class ScaledClock(Clock):
+    """
+    Time flowing at `rate` times another clock (monotonic by default) that
+    can be paused. Every change re-anchors on the current reading, so pausing,
+    resuming or changing the rate never makes the clock jump or drift.
+    """
+
+    def __init__(self, base=None, rate=1.0):
+        self.base = base or MonotonicClock()
+        self.rate = rate
+        self.paused = False
+        self._anchor_base = self.base()
+        self._anchor_value = 0.0
+
+    def now(self):
+        if self.paused:
+            return self._anchor_value
+        return self._anchor_value + (self.base() - self._anchor_base) * self.rate
+
+    def _reanchor(self):
+        self._anchor_value = self.now()
+        self._anchor_base = self.base()
+
+    def pause(self):
+        if not self.paused:
+            self._reanchor()
+            self.paused = True
+
+    def resume(self):
+        if self.paused:
+            self._anchor_base = self.base()
+            self.paused = False
+
+    def set_rate(self, rate):
+        self._reanchor()
+        self.rate = rate
+
+
+class PausableClock(ScaledClock):
+    """Monotonic time that stops while paused; the default for DanMuMachine."""
+    def __init__(self, base=None):
+        super().__init__(base, 1.0)
+
+
+class VirtualClock(Clock):
+    """Time that only moves when advanced explicitly, for tests and benchmarks."""
+
+    def __init__(self, now=0.0):
+        self._now = now
+        self.paused = False
+
+    def now(self):
+        return self._now
+
+    def advance(self, seconds):
+        if not self.paused:
+            self._now += seconds
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
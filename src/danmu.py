@@ -1,5 +1,7 @@
 # Base Class for DanMu
-from collections import deque
+from array import array
+from bisect import bisect_left
+import threading
 
 class DanMu:
     __slots__ = ('type', 'text', 'start_time', 'end_time', 'color', 'fontsize', 'start_x', 'start_y', 'end_x', 'end_y')
@@ -25,14 +27,161 @@ class DanMu:
         return f"DanMu({self.type}, {self.text}, {self.start_time}, {self.start_x}, {self.start_y}, {self.end_x}, {self.end_y})"
 
 
+# Compact encodings used by the columnar storage.
+TYPE_NAMES = ('R2L', 'L2R', 'TOP', 'BOTTOM')
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+def type_code(type):
+    """Storage code of a type name (or of a code already); raises ValueError for unknown types."""
+    if type in TYPE_CODES:
+        return TYPE_CODES[type]
+    if isinstance(type, int) and 0 <= type < len(TYPE_NAMES):
+        return type
+    raise ValueError(f'Unknown DanMu type: {type!r}')
+
+def pack_color(color):
+    r, g, b, a = color
+    a = max(0, min(255, int(round(a))))
+    return (int(r) << 24) | (int(g) << 16) | (int(b) << 8) | a
+
+def unpack_color(packed):
+    return (packed >> 24) & 0xFF, (packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF
+
+def _start_time(danmu):
+    return danmu.start_time
+
+
+class DanMuColumns:
+    """
+    Struct-of-arrays storage for DanMu sorted by start time. Indexing is O(1)
+    and builds a DanMu on demand, so only rows that are sent become objects.
+    Columns may be `array`s or read-only memoryviews (see dmcache).
+    """
+    __slots__ = ('start_time', 'end_time', 'type', 'color', 'fontsize', 'offsets', 'text')
+
+    def __init__(self, start_time=None, end_time=None, type=None, color=None,
+                 fontsize=None, offsets=None, text=None):
+        self.start_time = array('d') if start_time is None else start_time
+        self.end_time = array('d') if end_time is None else end_time
+        self.type = array('B') if type is None else type
+        self.color = array('I') if color is None else color
+        self.fontsize = array('H') if fontsize is None else fontsize
+        self.offsets = array('Q', [0]) if offsets is None else offsets
+        self.text = bytearray() if text is None else text
+
+    @classmethod
+    def from_danmu(cls, danmu_list):
+        columns = cls()
+        end_time, types, colors, fontsizes = array('d'), array('B'), array('I'), array('H')
+        start_time, offsets, text = array('d'), columns.offsets, columns.text
+        for danmu in danmu_list:
+            start_time.append(danmu.start_time)
+            end_time.append(danmu.end_time)
+            types.append(type_code(danmu.type))
+            colors.append(pack_color(danmu.color))
+            fontsizes.append(danmu.fontsize)
+            text += danmu.text.encode('utf-8')
+            offsets.append(len(text))
+        columns.start_time, columns.end_time = start_time, end_time
+        columns.type, columns.color, columns.fontsize = types, colors, fontsizes
+        return columns
+
+    def __len__(self):
+        return len(self.start_time)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.start_time)
+        return DanMu(
+            TYPE_NAMES[self.type[index]], self.text_at(index),
+            self.start_time[index], self.end_time[index],
+            color=unpack_color(self.color[index]), fontsize=self.fontsize[index],
+        )
+
+    def text_at(self, index):
+        return str(self.text[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+    def extend(self, other):
+        """Append `other` in place. `start_time` goes last since it defines the length."""
+        base = self.offsets[-1]
+        self.offsets.extend(base + offset for offset in other.offsets[1:])
+        self.text += other.text
+        self.end_time.extend(other.end_time)
+        self.type.extend(other.type)
+        self.color.extend(other.color)
+        self.fontsize.extend(other.fontsize)
+        self.start_time.extend(other.start_time)
+
+    def take(self, order):
+        """Return new columns holding the rows listed in `order`."""
+        columns = DanMuColumns(
+            array('d', [self.start_time[i] for i in order]),
+            array('d', [self.end_time[i] for i in order]),
+            array('B', [self.type[i] for i in order]),
+            array('I', [self.color[i] for i in order]),
+            array('H', [self.fontsize[i] for i in order]),
+        )
+        offsets, text, source = columns.offsets, columns.text, self.text
+        for i in order:
+            text += source[self.offsets[i]:self.offsets[i + 1]]
+            offsets.append(len(text))
+        return columns
+
+
 class DanMuPool:
-    def __init__(self, danmu_list):
-        self.danmu_list = deque(sorted(danmu_list, key=lambda danmu: danmu.start_time))
+    def __init__(self, danmu_list=(), columns=None):
+        if columns is None:
+            columns = DanMuColumns.from_danmu(sorted(danmu_list, key=_start_time))
+        self.danmu_list = columns
         self.fixed_top_available_rows = set()
         self.fixed_bottom_available_rows = set()
 
+        # Streaming support: `loading` is set while a background loader is still
+        # filling the pool, `revision` changes whenever existing indices shift.
+        self.loading = False
+        self.revision = 0
+        self._lock = threading.Lock()
+
+        # Precomputed positions for every row (see precompute.PoolLayout)
+        self.layout = None
+
     def __len__(self):
         return len(self.danmu_list)
 
+    def index_at(self, time):
+        """Index of the first DanMu starting at or after `time`, in O(log n)."""
+        return bisect_left(self.danmu_list.start_time, time)
+
+    def accepts_in_order(self, danmu_list):
+        """Whether `danmu_list` can be appended without disturbing existing indices."""
+        if not self.danmu_list or not danmu_list:
+            return True
+        return min(danmu.start_time for danmu in danmu_list) >= self.danmu_list.start_time[-1]
+
+    def extend(self, danmu_list):
+        """Merge a chunk of DanMu into the pool, keeping it sorted by start time."""
+        chunk = sorted(danmu_list, key=_start_time)
+        if not chunk:
+            return
+        with self._lock:
+            addition = DanMuColumns.from_danmu(chunk)
+            in_order = self.accepts_in_order(chunk)
+            self.layout = None
+            if in_order and isinstance(self.danmu_list.start_time, array):
+                self.danmu_list.extend(addition)
+                return
+            # Build the merged columns aside (memoryview columns are read-only),
+            # then swap them in one assignment so readers never observe a
+            # half-merged pool.
+            columns = DanMuColumns()
+            columns.extend(self.danmu_list)
+            columns.extend(addition)
+            if not in_order:
+                # Both halves are sorted runs, so this sort is a linear merge.
+                start_time = columns.start_time
+                columns = columns.take(sorted(range(len(start_time)), key=start_time.__getitem__))
+                self.revision += 1
+            self.danmu_list = columns
+
 if __name__ == "__main__":
     pass
\ No newline at end of file
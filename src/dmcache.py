@@ -0,0 +1,98 @@
+# Binary pre-parsed DanMu cache (.dmcache sidecar files)
+#
+# Layout (little endian, every column aligned to 8 bytes):
+#   header      magic, version, count, source size, source mtime (ns), path length
+#   path        UTF-8 source path the cache was built from
+#   start_time  float64[count]
+#   end_time    float64[count]
+#   type        uint8[count]     index into danmu.TYPE_NAMES
+#   color       uint32[count]    packed RRGGBBAA
+#   fontsize    uint16[count]
+#   offsets     uint64[count+1]  offsets into the text blob
+#   text        UTF-8 blob
+import mmap
+import os
+import struct
+from danmu import DanMuColumns, DanMuPool, TYPE_NAMES
+
+MAGIC = b'DMCA'
+VERSION = 1
+SUFFIX = '.dmcache'
+HEADER = struct.Struct('<4sHHQQqI')
+
+def cache_path(filename):
+    return filename + SUFFIX
+
+def _source_key(filename):
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def save(pool, filename):
+    """Write `pool` as the cache sidecar of source `filename`."""
+    path, size, mtime_ns = _source_key(filename)
+    path_bytes = path.encode('utf-8')
+    columns = pool.danmu_list
+
+    tmp_name = cache_path(filename) + '.tmp'
+    try:
+        with open(tmp_name, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(columns), size, mtime_ns, len(path_bytes)))
+            f.write(path_bytes)
+            for name in DanMuColumns.__slots__:
+                column = getattr(columns, name)
+                f.write(b'\0' * (_align(f.tell()) - f.tell()))
+                f.write(column)
+        os.replace(tmp_name, cache_path(filename))
+    except OSError as e:
+        print(f"Warning: Failed to write DanMu cache for '{filename}'. {e}")
+
+
+def load(filename):
+    """Open the cache sidecar of `filename`, or return None if missing or stale."""
+    name = cache_path(filename)
+    if not os.path.isfile(name):
+        return None
+
+    path, size, mtime_ns = _source_key(filename)
+    with open(name, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, version, _, count, cached_size, cached_mtime_ns, path_len = HEADER.unpack(header)
+        if (magic, version, cached_size, cached_mtime_ns) != (MAGIC, VERSION, size, mtime_ns):
+            return None
+        if f.read(path_len).decode('utf-8', 'replace') != path:
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # A truncated or corrupt file is treated like a stale one and rebuilt
+    view = memoryview(buffer)
+    offset = HEADER.size + path_len
+    columns = []
+    for typecode, length in (('d', count), ('d', count), ('B', count), ('I', count), ('H', count), ('Q', count + 1)):
+        offset = _align(offset)
+        nbytes = length * struct.calcsize(typecode)
+        if offset + nbytes > len(view):
+            return _invalid(name, view, columns)
+        columns.append(view[offset:offset + nbytes].cast(typecode))
+        offset += nbytes
+    offset = _align(offset)
+    offsets = columns[-1]
+    if offsets[0] != 0 or offset + offsets[count] > len(view) or (count and max(columns[2]) >= len(TYPE_NAMES)):
+        return _invalid(name, view, columns)
+    columns.append(view[offset:offset + offsets[count]])
+
+    # The memoryviews keep `buffer` mapped for as long as the pool lives.
+    pool = DanMuPool(columns=DanMuColumns(*columns))
+    print(f"Read {count} DanMu from cache {name}.")
+    return pool
+
+def _invalid(name, view, columns):
+    print(f"Warning: Ignoring corrupt DanMu cache '{name}'.")
+    for column in columns:
+        column.release()
+    view.release()
+    return None
@@ -5,9 +5,9 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QPropertyAnimation, QPoint, QEasingCurve, QTimer
 from PySide6.QtGui import QFont, QFontMetrics, QIcon, QAction
-import parser
 import settings
 from renderer import DanMuMachine
+from loader import PoolLoader
 
 import cProfile, pstats, io
 
@@ -30,20 +30,62 @@ class App(QMainWindow):
         self.init_ui()
         
         self.danmu_machine = DanMuMachine(self)
+        self.tray = None
+        self.profiler = None
+        self.loader = None
+        self.loaders = []  # Keeps cancelled loaders alive until their thread exits
+        QApplication.instance().aboutToQuit.connect(self.stop_loading)
         
         self.open_file()
 
     def open_file(self):
         fname = self.open_file_dialog()
-        if fname.endswith('.xml'):
-            self.danmu_machine.danmu_pool = parser.read_xml(fname)
-        elif fname.endswith('.ass'):
-            self.danmu_machine.danmu_pool = parser.read_ass(fname)
-        else:
-            raise Exception(f'Unsupported file type: {fname}')
-        print(f'Total DanMu loaded: {len(self.danmu_machine.danmu_pool)}')
+        if not fname:
+            return
+        if self.loader is not None:
+            self.loader.cancel()
+        self.loaders = [loader for loader in self.loaders if loader.thread.isRunning()]
 
-        self.danmu_machine.reset_time()
+        # The first file starts playing while it loads; later ones replace the
+        # playing file only once they are fully loaded.
+        self.loader = PoolLoader(
+            fname, streaming=self.danmu_machine.danmu_pool is None, workers=self.danmu_machine.config.load_workers,
+        )
+        self.loader.progress.connect(self.on_load_progress)
+        self.loader.ready.connect(self.on_pool_ready)
+        self.loader.finished.connect(self.on_load_finished)
+        self.loader.failed.connect(self.on_load_failed)
+        self.loaders.append(self.loader)
+        self.loader.start()
+
+    def stop_loading(self):
+        for loader in self.loaders:
+            loader.cancel()
+            loader.thread.wait()
+
+    def on_load_progress(self, done, total, count):
+        if self.sender() is not self.loader or self.tray is None:
+            return
+        name = os.path.basename(self.loader.filename)
+        self.tray.setToolTip(f'Loading {name}: {done * 100 // max(total, 1)}% ({count} DanMu)')
+
+    def on_pool_ready(self, pool):
+        if self.sender() is self.loader:
+            self.danmu_machine.set_pool(pool)
+
+    def on_load_finished(self, pool):
+        if self.sender() is not self.loader:
+            return
+        print(f'Total DanMu loaded: {len(pool)}')
+        if self.tray is not None:
+            self.tray.setToolTip(f'{self.title}: {os.path.basename(self.loader.filename)} ({len(pool)} DanMu)')
+
+    def on_load_failed(self, message):
+        if self.sender() is not self.loader:
+            return
+        print(f'Error: Failed to load {self.loader.filename}. {message}')
+        if self.tray is not None:
+            self.tray.showMessage(self.title, f'Failed to load {os.path.basename(self.loader.filename)}', QSystemTrayIcon.Warning)
 
     def open_file_dialog(self):
         options = QFileDialog.Options()
@@ -58,21 +100,48 @@ class App(QMainWindow):
 
     def keyPressEvent(self, event):
         super().keyPressEvent(event)
+        if self.danmu_machine.danmu_pool is None:
+            return  # Nothing loaded yet
         if event.text() == ',':
             # Rewind by 2 seconds
             self.danmu_machine.rewind(2)
-            self.danmu_machine.update_current_danmu_id()
             
         elif event.text() == '.':
             # Fast-forward by 2 seconds
             self.danmu_machine.fast_forward(2)
-            self.danmu_machine.update_current_danmu_id()
             
         elif event.key() == Qt.Key_Space:
             self.show_settings_dialog()
     
+    def toggle_profiling(self):
+        """Start a cProfile capture, or stop it, print the hottest calls and offer to save it."""
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            return True
+        self.profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(30)
+        print(stream.getvalue())
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Profile", "danmu.prof", "Profile (*.prof)")
+        if file_name:
+            self.profiler.dump_stats(file_name)
+        self.profiler = None
+        return False
+
+    def dump_perf_stats(self):
+        if not self.danmu_machine.perf.attached:
+            # Timings are only recorded while the HUD is shown
+            if self.tray is not None:
+                self.tray.showMessage(self.title, 'Show the Performance HUD to record stats first.', QSystemTrayIcon.Warning)
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Performance Stats", "danmu-perf.json", "JSON (*.json)")
+        if file_name:
+            self.danmu_machine.perf.dump(file_name)
+
     def show_settings_dialog(self):
-        settings.settings_dialog(self)
+        if self.danmu_machine.danmu_pool is not None:
+            settings.settings_dialog(self)
 
 
 def resource_path(relative_path):
@@ -97,6 +166,8 @@ def main():
     tray = QSystemTrayIcon()
     tray.setIcon(icon)
     tray.setVisible(True)
+    tray.setToolTip(ex.title)
+    ex.tray = tray
     ex.setWindowIcon(icon)
     
     menu = QMenu()
@@ -104,10 +175,26 @@ def main():
     open_action.triggered.connect(ex.open_file)
     settings_action = QAction("Settings")
     settings_action.triggered.connect(ex.show_settings_dialog)
+    hud_action = QAction("Performance HUD")
+    hud_action.setCheckable(True)
+    hud_action.toggled.connect(ex.danmu_machine.set_hud_visible)
+    dump_action = QAction("Dump Performance Stats")
+    dump_action.triggered.connect(ex.dump_perf_stats)
+    dump_action.setEnabled(False)
+    hud_action.toggled.connect(dump_action.setEnabled)
+    profile_action = QAction("Start Profiling")
+    profile_action.triggered.connect(
+        lambda: profile_action.setText("Stop Profiling" if ex.toggle_profiling() else "Start Profiling")
+    )
     quit_action = QAction("Quit")
     quit_action.triggered.connect(app.quit)
     menu.addAction(open_action)
     menu.addAction(settings_action)
+    menu.addSeparator()
+    menu.addAction(hud_action)
+    menu.addAction(dump_action)
+    menu.addAction(profile_action)
+    menu.addSeparator()
     menu.addAction(quit_action)
     
     tray.setContextMenu(menu)
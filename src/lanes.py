@@ -0,0 +1,168 @@
+# Lane allocation and danmu placement for the renderer
+import heapq
+
+
+class LaneAllocator:
+    """
+    Lanes for danmu scrolling across a screen of `screen_width`.
+
+    Every lane remembers when the tail of its last danmu clears the entry edge
+    and when that danmu has left the screen. A new danmu fits a lane once the
+    tail is clear and it cannot catch up before the old one leaves, which
+    depends on both widths and speeds instead of a fixed cool-down. Both times
+    are kept in a min segment tree, so the topmost free lane is found in
+    O(log lanes) in the usual case.
+    """
+
+    def __init__(self, n_lanes, screen_width):
+        self.n_lanes = max(int(n_lanes), 1)
+        self.screen_width = screen_width
+        self.size = 1
+        while self.size < self.n_lanes:
+            self.size *= 2
+        self.clear()
+
+    def clear(self):
+        # Padding leaves are never free; real lanes start free.
+        self.tail = [float('inf')] * (2 * self.size)
+        self.exit = [float('inf')] * (2 * self.size)
+        for lane in range(self.n_lanes):
+            self.tail[self.size + lane] = float('-inf')
+            self.exit[self.size + lane] = float('-inf')
+        for node in range(self.size - 1, 0, -1):
+            self._pull(node)
+
+    def _pull(self, node):
+        self.tail[node] = min(self.tail[2 * node], self.tail[2 * node + 1])
+        self.exit[node] = min(self.exit[2 * node], self.exit[2 * node + 1])
+
+    def _find(self, now, catch_time):
+        """Topmost lane whose tail is clear at `now` and empty by `catch_time`."""
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if self.tail[node] > now or self.exit[node] > catch_time:
+                continue
+            if node >= self.size:
+                return node - self.size
+            stack.append(2 * node + 1)
+            stack.append(2 * node)
+        return None
+
+    def _earliest_tail(self):
+        node = 1
+        while node < self.size:
+            node = 2 * node if self.tail[2 * node] <= self.tail[2 * node + 1] else 2 * node + 1
+        return node - self.size
+
+    def allocate(self, now, text_width, duration):
+        """
+        Reserve a lane for a danmu of `text_width` entering at `now` and taking
+        `duration` seconds to cross. When every lane is busy, the lane whose
+        tail clears first is reused, as the old row heap did.
+        """
+        duration = max(duration, 1e-3)
+        speed = (self.screen_width + text_width) / duration
+        catch_time = now + self.screen_width / speed  # Head reaches the exit edge
+        lane = self._find(now, catch_time)
+        if lane is None:
+            lane = self._earliest_tail()
+        self.reserve(lane, now + text_width / speed, now + duration)
+        return lane
+
+    def reserve(self, lane, tail_time, exit_time):
+        """Mark `lane` busy until its tail clears at `tail_time` and it is empty at `exit_time`."""
+        node = self.size + lane
+        self.tail[node] = max(self.tail[node], tail_time)
+        self.exit[node] = max(self.exit[node], exit_time)
+        node //= 2
+        while node:
+            self._pull(node)
+            node //= 2
+
+
+class ScreenLayout:
+    """
+    Placement state for one screen: scroll lanes plus the fixed top and
+    bottom rows. Used live by DanMuMachine and ahead of time by precompute.
+    """
+    TOP_MARGIN = 25
+    BOTTOM_MARGIN = 50
+
+    def __init__(self, screen_width, screen_height, row_height, max_rows):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.row_height = row_height
+        self.max_rows = max_rows
+        self.scroll_lanes = LaneAllocator(max_rows, screen_width)
+        self.fixed_top_rows = [(0, i) for i in range(self.max_rows)]
+        self.fixed_bottom_rows = [(0, i) for i in range(self.max_rows)]
+
+    def clear(self):
+        self.scroll_lanes.clear()
+
+    def occupy(self, y, tail_time, exit_time, scrolling=True):
+        """
+        Re-register a danmu already on screen at height `y`, e.g. after the
+        layout was rebuilt for new settings. Scrolling danmu keep their lane
+        until `tail_time`/`exit_time`, fixed ones their row until `exit_time`.
+        Danmu outside the current area are left to finish on their own.
+        """
+        if scrolling:
+            lane = round((y - self.TOP_MARGIN) / self.row_height)
+            if 0 <= lane < self.scroll_lanes.n_lanes:
+                self.scroll_lanes.reserve(lane, tail_time, exit_time)
+            return
+        if y < self.screen_height / 2:
+            rows, row = self.fixed_top_rows, round((y - self.TOP_MARGIN) / self.row_height)
+        else:
+            rows, row = self.fixed_bottom_rows, round((self.screen_height - self.BOTTOM_MARGIN - y) / self.row_height) - 1
+        for i, (available_time, fixed_row) in enumerate(rows):
+            if fixed_row == row:
+                rows[i] = (max(available_time, exit_time), row)
+                heapq.heapify(rows)
+                return
+
+    def place(self, danmu, text_width, current_time, duration_in_seconds):
+        """Set the start and end position of `danmu` to avoid overlap."""
+        screen_width, screen_height = self.screen_width, self.screen_height
+
+        if danmu.type in ['R2L', 'L2R']:  # Scrolls
+            n_row = self.scroll_lanes.allocate(current_time, text_width, duration_in_seconds)
+            danmu.start_y = n_row * self.row_height + self.TOP_MARGIN
+            danmu.end_y = danmu.start_y
+            
+            if danmu.type == 'R2L':  # Right to Left
+                danmu.start_x = screen_width
+                danmu.end_x = - text_width
+            else:
+                danmu.start_x = -text_width
+                danmu.end_x = screen_width            
+
+        elif danmu.type == 'TOP':  # Fixed Top
+            # Allocate the next available row for fixed top
+            if self.fixed_top_rows:
+                available_time, row = heapq.heappop(self.fixed_top_rows)
+            else:
+                row = 0
+            danmu.start_x = (screen_width - text_width) / 2
+            danmu.end_x = danmu.start_x  # Fixed position
+            danmu.start_y = row * self.row_height + self.TOP_MARGIN
+            danmu.end_y = danmu.start_y
+            new_available_time = current_time + duration_in_seconds
+            heapq.heappush(self.fixed_top_rows, (new_available_time, row))
+            
+        elif danmu.type == 'BOTTOM':  # Fixed Bottom
+            if self.fixed_bottom_rows:
+                available_time, row = heapq.heappop(self.fixed_bottom_rows)
+            else:
+                row = 0
+            danmu.start_x = (screen_width - text_width) / 2
+            danmu.end_x = danmu.start_x  # Fixed position
+            danmu.start_y = screen_height - self.BOTTOM_MARGIN - ((row + 1) * self.row_height)
+            danmu.end_y = danmu.start_y
+            new_available_time = current_time + duration_in_seconds
+            heapq.heappush(self.fixed_bottom_rows, (new_available_time, row))
+
+        # Ensure rows don't exceed screen height or become negative
+        danmu.start_y = max(0, min(danmu.start_y, screen_height - self.BOTTOM_MARGIN - self.row_height))
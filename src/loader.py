@@ -0,0 +1,110 @@
+# Loading danmu files off the GUI thread
+import os
+import multiprocessing
+from PySide6.QtCore import QObject, QThread, Signal
+from danmu import DanMuPool
+import dmcache
+import parser
+
+
+# Smaller XML files are parsed in the loader thread, as starting worker
+# processes would take longer than parsing them.
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class PoolLoader(QObject):
+    """
+    Loads a .xml or .ass file (or its .dmcache sidecar) in a QThread.
+
+    `progress(bytes_read, total_bytes, count)` is emitted as the file is read
+    and `ready(pool)` once the pool can be played. With `streaming`, an XML
+    pool is handed over as soon as loading starts and keeps filling in the
+    background; otherwise it is only handed over complete, so whatever is
+    playing keeps rendering until then. `failed(message)` reports errors.
+    Signals are delivered to the GUI thread.
+
+    A large XML file that is not streamed is parsed by `workers` processes
+    (0 for one per CPU, 1 to parse in the loader thread); that parse reports
+    no progress and is only cancelled once it completes.
+    """
+    progress = Signal(int, int, int)
+    ready = Signal(object)
+    finished = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, filename, streaming=False, workers=1):
+        super().__init__()
+        self.filename = filename
+        self.streaming = streaming
+        self.workers = workers
+        self.cancelled = False
+        self.thread = QThread()
+        self.moveToThread(self.thread)
+        self.thread.started.connect(self.run)
+        self.finished.connect(self.thread.quit)
+        self.failed.connect(self.thread.quit)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        """
+        Stop at the next chunk; nothing is emitted afterwards. ASS files
+        outside the danmu subset are read by the `ass` library in one call,
+        which cannot be interrupted, so those stop only once it returns.
+        """
+        self.cancelled = True
+
+    def run(self):
+        try:
+            pool = self.load()
+        except LoadCancelled:
+            self.thread.quit()
+        except Exception as e:
+            self.failed.emit(f'{type(e).__name__}: {e}')
+        else:
+            self.finished.emit(pool)
+
+    def load(self):
+        fname = self.filename
+        total = os.path.getsize(fname)
+        pool = dmcache.load(fname)
+        if pool is not None:
+            self.report(total, total, len(pool))
+            self.ready.emit(pool)
+            return pool
+
+        workers = self.workers or os.cpu_count() or 1
+        if fname.endswith('.xml') and not self.streaming and workers > 1 and total >= PARALLEL_MIN_BYTES:
+            # Spawned workers, as forking a process that runs Qt threads is unsafe
+            pool = parser.read_xml_parallel(fname, workers, multiprocessing.get_context('spawn'))
+            if pool is None:
+                raise ValueError(f'Failed to parse {fname}')
+        elif fname.endswith('.xml'):
+            pool = DanMuPool()
+            if self.streaming:
+                pool.loading = True
+                self.ready.emit(pool)
+            try:
+                parser.load_xml_into(pool, fname, progress=lambda done, count: self.report(done, total, count))
+            finally:
+                pool.loading = False
+        elif fname.endswith('.ass'):
+            pool = parser.read_ass(fname, progress=lambda done, count: self.report(done, total, count))
+        else:
+            raise ValueError(f'Unsupported file type: {fname}')
+
+        self.report(total, total, len(pool))
+        if not self.streaming or not fname.endswith('.xml'):
+            self.ready.emit(pool)
+        dmcache.save(pool, fname)
+        return pool
+
+    def report(self, done, total, count):
+        if self.cancelled:
+            raise LoadCancelled()
+        self.progress.emit(done, total, count)
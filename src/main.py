@@ -1,4 +1,7 @@
+import multiprocessing
 from gui import main
 
 if __name__ == "__main__":
+    # Needed by the parallel XML loader in frozen (PyInstaller) builds.
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -1,6 +1,7 @@
-from danmu import DanMu, DanMuPool
+from danmu import DanMu, DanMuColumns, DanMuPool
 import ass, xml.etree.ElementTree as ET
-import os, re
+import os, mmap
+from concurrent.futures import ProcessPoolExecutor
 
 
 def RRGGBB(color):
@@ -41,34 +42,141 @@ def bili_xml(event):
     hex_color = RRGGBB(int(color) & 0xFFFFFF)
     return DanMu(style_name, text, float(start), float(end), color=color_format(hex_color), fontsize=int(size))
 
-def read_xml(filename):
+def iter_xml(filename, chunk_size=10000):
+    """
+    Stream <d> elements from a Bilibili XML file, given as a path or a binary
+    file object, yielding lists of at most `chunk_size` DanMu. Elements are
+    cleared as soon as they are converted so memory stays flat regardless of
+    the file size.
+    """
+    context = ET.iterparse(filename, events=('start', 'end'))
+    _, root = next(context)
+
+    chunk = []
+    for event, elem in context:
+        if event != 'end' or elem.tag != 'd':
+            continue
+        danmu = bili_xml(elem)
+        if danmu is not None:
+            chunk.append(danmu)
+        root.clear()
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def read_xml(filename, workers=1):
     if not os.path.isfile(filename):
         raise FileExistsError(f"Error: Input file '{filename}' does not exist.")
+    if workers > 1:
+        return read_xml_parallel(filename, workers)
     
     # Parse the XML file
     try:
-        tree = ET.parse(filename)
-        root = tree.getroot()
+        danmus = [danmu for chunk in iter_xml(filename) for danmu in chunk]
     except ET.ParseError as e:
         print(f"Error: Failed to parse XML file '{filename}'. {e}")
         return
-    
-    danmus = []
-    for event in root.iter('d'):
-        danmus.append(bili_xml(event))
 
     print(f"Read {len(danmus)} DanMu from {filename}.")
     return DanMuPool(danmus)
 
-def read_ass(filename):
+def split_xml(filename, n_chunks):
+    """Return (start, end) byte ranges covering the <d> elements, cut at <d boundaries."""
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        first = buffer.find(b'<d ')
+        last = buffer.rfind(b'</d>')
+        if first < 0 or last < 0:
+            return []
+        last += len(b'</d>')
+
+        bounds = [first]
+        step = max((last - first) // n_chunks, 1)
+        for i in range(1, n_chunks):
+            cut = buffer.find(b'<d ', max(first + i * step, bounds[-1] + 1), last)
+            if cut < 0:
+                break
+            bounds.append(cut)
+        bounds.append(last)
+    return list(zip(bounds, bounds[1:]))
+
+def _parse_xml_range(filename, start, end):
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        content = f.read(end - start)
+    root = ET.fromstring(b'<i>' + content + b'</i>')
+    danmus = [danmu for danmu in map(bili_xml, root.iter('d')) if danmu is not None]
+    return DanMuColumns.from_danmu(sorted(danmus, key=lambda danmu: danmu.start_time))
+
+def read_xml_parallel(filename, workers=None, mp_context=None):
+    """
+    Parse `filename` in a process pool. The file is split at <d boundaries,
+    every range is parsed and sorted by a worker, and the sorted runs are
+    merged in file order, so the result matches read_xml exactly.
+    `mp_context` is passed to the ProcessPoolExecutor.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = split_xml(filename, workers * 4)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            starts, ends = zip(*ranges) if ranges else ((), ())
+            runs = list(executor.map(_parse_xml_range, [filename] * len(starts), starts, ends))
+    except ET.ParseError as e:
+        print(f"Error: Failed to parse XML file '{filename}'. {e}")
+        return
+
+    columns = DanMuColumns()
+    for run in runs:
+        columns.extend(run)
+    # Runs are already sorted, so this stable sort only merges them.
+    start_time = columns.start_time
+    columns = columns.take(sorted(range(len(start_time)), key=start_time.__getitem__))
+
+    print(f"Read {len(columns)} DanMu from {filename}.")
+    return DanMuPool(columns=columns)
+
+def load_xml_into(pool, filename, chunk_size=10000, progress=None):
+    """
+    Parse `filename` into `pool` chunk by chunk. `progress(bytes_read, count)`
+    is called after every chunk; it may raise to abort the load. Returns the
+    number of DanMu read.
+    """
+    count = 0
+    pending = []
+    with open(filename, 'rb') as f:
+        for chunk in iter_xml(f, chunk_size):
+            pending.extend(chunk)
+            # Out-of-order chunks force a full merge, so hold them back until
+            # they are as large as the pool to keep the total cost O(n log n).
+            if pool.accepts_in_order(pending) or len(pending) >= len(pool):
+                pool.extend(pending)
+                count += len(pending)
+                pending = []
+            if progress is not None:
+                progress(f.tell(), count + len(pending))
+        pool.extend(pending)
+        count += len(pending)
+    return count
+
+def read_ass(filename, progress=None):
+    """
+    Read a danmu ASS file. `progress(bytes_read, count)` is called every
+    10000 events by the fast reader and may raise to abort; the `ass`
+    library fallback for other files reports nothing and cannot be aborted.
+    """
     if filename.endswith('.ass'):
-        with open(filename, 'r', encoding='utf-8-sig') as f:
-            doc = ass.parse(f)
+        try:
+            danmu_list = list(iter_ass_events(filename, progress))
+        except UnsupportedASS:
+            # Anything the fast reader does not expect goes through the library
+            with open(filename, 'r', encoding='utf-8-sig') as f:
+                doc = ass.parse(f)
 
-        danmu_list = [
-            create_by_ass(evt, doc.play_res_x, doc.play_res_y)
-            for evt in doc.events
-        ]
+            danmu_list = [
+                create_by_ass(evt, doc.play_res_x, doc.play_res_y)
+                for evt in doc.events
+            ]
 
         return DanMuPool(danmu_list)
     elif filename.endswith('.xml'):
@@ -77,42 +185,136 @@ def read_ass(filename):
         raise ValueError(f'Unsupported file format: {filename}')
 
 
+class UnsupportedASS(Exception):
+    """Raised by iter_ass_events for files outside the danmu subset of ASS."""
+
+
+def iter_ass_events(filename, progress=None):
+    """
+    Stream DanMu from the Dialogue lines of a danmu ASS file (as written by
+    tools/bilibili.py) in one pass, reading only PlayResX/Y, the [Events]
+    format and the Start, End, Style and Text fields. Raises UnsupportedASS
+    for anything else, so callers can fall back to the `ass` library.
+    `progress(bytes_read, count)` is called every 10000 events.
+    """
+    play_res_x = play_res_y = None
+    section = None
+    fields = None
+    bytes_read = count = 0
+    with open(filename, 'rb') as f:
+        for raw in f:
+            bytes_read += len(raw)
+            line = raw.decode('utf-8-sig')
+            if line.startswith('Dialogue:'):
+                if section != '[events]' or fields is None:
+                    raise UnsupportedASS('Dialogue outside [Events]')
+                values = line[9:].rstrip('\r\n').split(',', len(fields) - 1)
+                if len(values) != len(fields):
+                    raise UnsupportedASS(f'Malformed event: {line!r}')
+                yield _danmu_from_event(
+                    _ass_seconds(values[fields['start']]), _ass_seconds(values[fields['end']]),
+                    values[fields['style']].strip(), values[fields['text']], play_res_x, play_res_y,
+                )
+                count += 1
+                if progress is not None and count % 10000 == 0:
+                    progress(bytes_read, count)
+            elif line.startswith('['):
+                section = line.strip().lower()
+            elif section == '[script info]':
+                key, _, value = line.partition(':')
+                try:
+                    if key == 'PlayResX':
+                        play_res_x = int(value)
+                    elif key == 'PlayResY':
+                        play_res_y = int(value)
+                except ValueError:
+                    raise UnsupportedASS(f'Unexpected {key}: {value.strip()!r}')
+            elif section == '[events]' and line.startswith('Format:'):
+                names = [name.strip().lower() for name in line[7:].split(',')]
+                fields = {name: i for i, name in enumerate(names)}
+                if not {'start', 'end', 'style', 'text'} <= fields.keys() or names[-1] != 'text':
+                    raise UnsupportedASS(f'Unexpected event format: {line!r}')
+                if not play_res_x or not play_res_y:
+                    raise UnsupportedASS('Missing PlayResX/PlayResY')
+
+
+def _ass_seconds(value):
+    # H:MM:SS.CC, rounded to microseconds like the ass library's timedelta
+    try:
+        hms, _, fraction = value.partition('.')
+        hours, minutes, seconds = hms.split(':')
+        microseconds = round(int(fraction) * 10**6 / 10**len(fraction)) if fraction else 0
+        return ((int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 10**6 + microseconds) / 10**6
+    except ValueError:
+        raise UnsupportedASS(f'Malformed time: {value!r}')
+
+
+def parse_override(text):
+    """
+    Split an event text into its leading {override} block's tags and the
+    visible text. Only the tags DanMu needs are decoded: 'c' (BBGGRR hex),
+    'move' and 'pos' (lists of floats). Raises ValueError for malformed ones.
+    """
+    if not text.startswith('{'):
+        return {}, text
+    block, _, visible = text[1:].partition('}')
+    tags = {}
+    for token in block.split('\\')[1:]:
+        if token.startswith('c&H'):
+            tags['c'] = token[3:9]
+        elif token.startswith('1c&H'):
+            tags['c'] = token[4:10]
+        elif token.startswith('move(') or token.startswith('pos('):
+            name, _, args = token.partition('(')
+            try:
+                tags[name] = [float(arg) for arg in args.rstrip(')').split(',')]
+            except ValueError:
+                raise ValueError(f'Malformed override: {token!r}')
+    return tags, visible
+
+
 def create_by_ass(evt, play_res_x, play_res_y):
-    instance = DanMu()
+    return _danmu_from_event(
+        evt.start.total_seconds(), evt.end.total_seconds(), evt.style, evt.text, play_res_x, play_res_y,
+    )
+
 
-    # Extract text after the first '}'
-    instance.text = evt.text.partition('}')[2]
+def _danmu_from_event(start, end, style, text, play_res_x, play_res_y):
+    instance = DanMu()
+    tags, instance.text = parse_override(text)
 
     # Time
-    instance.start_time = evt.start.total_seconds()
-    instance.end_time = evt.end.total_seconds()
+    instance.start_time = start
+    instance.end_time = end
 
     # Style
-    color_match = re.search(r'\\c&H([0-9A-Fa-f]{6})&?', evt.text)
-    if color_match:
-        instance.color = color_format(color_match.group(1))
+    if 'c' in tags and len(tags['c']) == 6:
+        instance.color = color_format(tags['c'])
     else:
         instance.color = (255, 255, 255, 0.8*255)
 
     # Position and Type
-    if evt.style == 'R2L':
-        pos = re.findall(r"([-]?[0-9]+(?:\.[0-9]*)?)", evt.text)[0:4]
-        instance.start_x = float(pos[0]) / play_res_x
-        instance.start_y = float(pos[1]) / play_res_y
-        instance.end_x = float(pos[2]) / play_res_x
-        instance.end_y = float(pos[3]) / play_res_y
+    if style == 'R2L':
+        if len(tags.get('move', ())) < 4:
+            raise ValueError('R2L event without \\move')
+        pos = tags['move']
+        instance.start_x = pos[0] / play_res_x
+        instance.start_y = pos[1] / play_res_y
+        instance.end_x = pos[2] / play_res_x
+        instance.end_y = pos[3] / play_res_y
         instance.type = 'R2L'  # Scrolling
-    elif evt.style == 'Fix':
-        pos = re.findall(r"([-]?[0-9]+(?:\.[0-9]*)?)", evt.text)[0:2]
-        instance.start_x = float(pos[0]) / play_res_x
-        instance.start_y = float(pos[1]) / play_res_y
+    elif style == 'Fix':
+        if len(tags.get('pos', ())) < 2:
+            raise ValueError('Fix event without \\pos')
+        pos = tags['pos']
+        instance.start_x = pos[0] / play_res_x
+        instance.start_y = pos[1] / play_res_y
         instance.end_x = instance.start_x
         instance.end_y = instance.start_y
-        instance.type = 'TOP' if float(pos[1]) < play_res_y * 0.5 else 'BOTTOM'  # Fixed Top or Bottom
+        instance.type = 'TOP' if pos[1] < play_res_y * 0.5 else 'BOTTOM'  # Fixed Top or Bottom
     else:
-        raise ValueError(f'Undefined Style: {evt.style}')
+        raise ValueError(f'Undefined Style: {style}')
     
-    # print(evt, color_match)
     return instance
 
 
@@ -0,0 +1,188 @@
+# Hot-path instrumentation for DanMuMachine and an on-screen summary of it
+import json
+import time
+from collections import deque
+from functools import wraps
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QFont, QColor, QBrush
+from PySide6.QtWidgets import QGraphicsSimpleTextItem
+
+# Machine methods that get timed while a PerfMonitor is attached
+TIMED_METHODS = ('tick', 'send_one', 'calculate_initial_position', 'get_font_metrics', 'fly', 'paint_frame')
+
+
+class RollingHistogram:
+    """The last `size` samples of a quantity, summarized on demand."""
+
+    def __init__(self, size=600):
+        self.samples = deque(maxlen=size)
+        self.total = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.total += 1
+
+    def summary(self):
+        values = sorted(self.samples)
+        if not values:
+            return {'count': self.total}
+        at = lambda q: values[min(int(q * len(values)), len(values) - 1)]
+        return {
+            'count': self.total,
+            'mean': sum(values) / len(values),
+            'p50': at(0.5),
+            'p95': at(0.95),
+            'p99': at(0.99),
+            'max': values[-1],
+        }
+
+
+class PerfMonitor:
+    """
+    Times the hot methods of a DanMuMachine and samples its counters once
+    per tick. attach() wraps the methods on the instance and detach()
+    removes the wrappers, so a machine without a monitor pays nothing.
+    Durations are kept in milliseconds over the last `size` calls.
+    """
+
+    def __init__(self, machine, size=600):
+        self.machine = machine
+        self.size = size
+        self.attached = False
+        self.reset()
+
+    def reset(self):
+        self.durations = {name: RollingHistogram(self.size) for name in TIMED_METHODS}
+        self.dispatched = RollingHistogram(self.size)
+        self.dropped = RollingHistogram(self.size)
+        self.active = RollingHistogram(self.size)
+        self.font_metrics_hits = 0
+        self.font_metrics_misses = 0
+        self.started = time.time()
+
+    def attach(self):
+        if self.attached:
+            return
+        machine = self.machine
+        for name in TIMED_METHODS:
+            setattr(machine, name, self._timed(name, getattr(machine, name)))
+        self.attached = True
+
+    def detach(self):
+        if not self.attached:
+            return
+        for name in TIMED_METHODS:
+            del self.machine.__dict__[name]
+        self.attached = False
+
+    def _timed(self, name, method):
+        histogram = self.durations[name]
+        clock = time.perf_counter
+        machine = self.machine
+
+        if name == 'tick':
+            @wraps(method)
+            def timed(*args, **kwargs):
+                placed, dropped = machine.placed_danmus, machine.dropped_danmus
+                started = clock()
+                result = method(*args, **kwargs)
+                histogram.add((clock() - started) * 1000)
+                self.dispatched.add(machine.placed_danmus - placed)
+                self.dropped.add(machine.dropped_danmus - dropped)
+                self.active.add(machine.active_danmus)
+                return result
+        elif name == 'get_font_metrics':
+            @wraps(method)
+            def timed(*args, **kwargs):
+                cached = len(machine.font_metrics_cache)
+                started = clock()
+                result = method(*args, **kwargs)
+                histogram.add((clock() - started) * 1000)
+                if len(machine.font_metrics_cache) == cached:
+                    self.font_metrics_hits += 1
+                else:
+                    self.font_metrics_misses += 1
+                return result
+        else:
+            @wraps(method)
+            def timed(*args, **kwargs):
+                started = clock()
+                result = method(*args, **kwargs)
+                histogram.add((clock() - started) * 1000)
+                return result
+        return timed
+
+    def stats(self):
+        machine = self.machine
+        lookups = self.font_metrics_hits + self.font_metrics_misses
+        return {
+            'seconds': time.time() - self.started,
+            'duration_ms': {name: histogram.summary() for name, histogram in self.durations.items()},
+            'dispatched_per_tick': self.dispatched.summary(),
+            'dropped_per_tick': self.dropped.summary(),
+            'active': self.active.summary(),
+            'font_metrics': {
+                'entries': len(machine.font_metrics_cache),
+                'hits': self.font_metrics_hits,
+                'misses': self.font_metrics_misses,
+                'hit_rate': self.font_metrics_hits / lookups if lookups else 0.0,
+            },
+            'pixmap_cache': machine.pixmap_cache.stats(),
+            'label_pool': machine.pool_stats(),
+            'admission': machine.admission.stats(),
+        }
+
+    def dump(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, indent=2)
+
+
+class PerfHUD(QGraphicsSimpleTextItem):
+    """Top-left overlay with the monitor's summary, refreshed every `interval` ms."""
+
+    def __init__(self, monitor, interval=500):
+        super().__init__()
+        self.monitor = monitor
+        self.setFont(QFont('Consolas', 10))
+        self.setBrush(QBrush(QColor(0, 255, 0)))
+        self.setPos(8, 8)
+        self.setZValue(1e6)
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+
+    def show_on(self, scene):
+        self.monitor.attach()
+        scene.addItem(self)
+        self.refresh()
+        self.timer.start()
+
+    def hide_from(self, scene):
+        self.timer.stop()
+        self.invalidate()
+        scene.removeItem(self)
+        self.monitor.detach()
+
+    def invalidate(self):
+        # Views may not repaint on scene changes (see viewport_update), so
+        # update the area under the HUD directly.
+        for view in self.scene().views():
+            view.viewport().update(view.mapFromScene(self.sceneBoundingRect()).boundingRect())
+
+    def refresh(self):
+        stats = self.monitor.stats()
+        lines = []
+        for name, summary in stats['duration_ms'].items():
+            if 'mean' in summary:
+                lines.append(f"{name:<27}p50 {summary['p50']:6.2f}  p99 {summary['p99']:6.2f}  max {summary['max']:6.2f} ms")
+        for label, key in (('dispatched/tick', 'dispatched_per_tick'), ('dropped/tick', 'dropped_per_tick'), ('active', 'active')):
+            summary = stats[key]
+            if 'mean' in summary:
+                lines.append(f"{label:<27}mean {summary['mean']:6.1f}  max {summary['max']}")
+        pool, pixmaps = stats['label_pool'], stats['pixmap_cache']
+        lines.append(f"{'labels':<27}live {pool['live']}  pooled {pool['pooled']}  created {pool['created']}  leaked {pool['leaked']}")
+        lines.append(f"{'pixmap cache':<27}{pixmaps['entries']} entries  hit rate {pixmaps['hit_rate']:.1%}")
+        lines.append(f"{'font metrics':<27}{stats['font_metrics']['entries']} entries  hit rate {stats['font_metrics']['hit_rate']:.1%}")
+        self.invalidate()
+        self.setText('\n'.join(lines))
+        self.invalidate()
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+from PySide6.QtGui import QPainter, QPixmap, QFontMetrics, QPainterPath, QPen, QColor
+from PySide6.QtCore import Qt, QRect
+
+
+def render_text_pixmap(text, font, color, outline=0, device_pixel_ratio=1.0):
+    """
+    Rasterize `text` once into a transparent pixmap, optionally outlined.
+    The pixmap holds `device_pixel_ratio` device pixels per logical pixel so
+    text stays sharp on HiDPI screens, and covers the ink of the text
+    (italic overhang included) as well as its advance and line height.
+    """
+    metrics = QFontMetrics(font)
+    ink = metrics.boundingRect(text)
+    box = ink.united(QRect(0, -metrics.ascent(), metrics.horizontalAdvance(text), metrics.height()))
+    box.adjust(-outline, -outline, outline, outline)
+    pixmap = QPixmap(
+        max(round(box.width() * device_pixel_ratio), 1), max(round(box.height() * device_pixel_ratio), 1)
+    )
+    pixmap.setDevicePixelRatio(device_pixel_ratio)
+    pixmap.fill(Qt.transparent)
+    # Logical coordinates from here on; (x, y) is the baseline origin
+    x, y = -box.left(), -box.top()
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.TextAntialiasing)
+    if outline:
+        path = QPainterPath()
+        path.addText(x, y, font, text)
+        # Dark text gets a white border, like the ASS converter does
+        dark = color.red() * 0.299 + color.green() * 0.587 + color.blue() * 0.114 < 0x30
+        border = QColor(255, 255, 255, color.alpha()) if dark else QColor(0, 0, 0, color.alpha())
+        painter.strokePath(path, QPen(border, outline * 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        painter.fillPath(path, color)
+    else:
+        painter.setFont(font)
+        painter.setPen(color)
+        painter.drawText(x, y, text)
+    painter.end()
+    return pixmap
+
+
+class PixmapCache:
+    """
+    LRU cache of rasterized danmu text keyed on (text, font, size, color,
+    outline). Popular comments repeat thousands of times, so a hit turns a
+    text layout plus rasterization into a single blit. Eviction keeps the
+    pixmaps under `budget_bytes`. Pixmaps are rendered for the screen's
+    `device_pixel_ratio`.
+    """
+
+    def __init__(self, budget_bytes=64 * 1024 * 1024, device_pixel_ratio=1.0):
+        self.budget_bytes = budget_bytes
+        self.device_pixel_ratio = device_pixel_ratio
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._pixmaps = OrderedDict()
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    def get(self, text, font, color, outline=0):
+        key = (text, font.family(), font.pointSize(), color.rgba(), outline, self.device_pixel_ratio)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            self.hits += 1
+            return pixmap
+
+        self.misses += 1
+        pixmap = render_text_pixmap(text, font, color, outline, self.device_pixel_ratio)
+        self._pixmaps[key] = pixmap
+        self.used_bytes += self._size(pixmap)
+        while self.used_bytes > self.budget_bytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self.used_bytes -= self._size(evicted)
+        return pixmap
+
+    def clear(self):
+        self._pixmaps.clear()
+        self.used_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._pixmaps),
+            'used_bytes': self.used_bytes,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _size(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
@@ -0,0 +1,73 @@
+class ObjectPool:
+    """
+    Bounded free list of reusable objects made by `create()`. Released
+    objects are kept for reuse up to `capacity` and handed to `destroy()`
+    beyond it. `warm(n)` allocates ahead of a burst, and `trim()` drops
+    idle objects above the high-water mark of concurrent use since the last
+    trim. Called periodically (DanMuMachine does so every
+    `pool_trim_interval` seconds), a quiet stretch gives memory back without
+    a busy one paying to allocate again.
+
+    Every object is accounted for: created == destroyed + live + pooled.
+    """
+
+    def __init__(self, create, destroy, capacity=300):
+        self.create = create
+        self.destroy = destroy
+        self.capacity = capacity
+        self._idle = []
+        self.live = 0
+        self.created = 0
+        self.destroyed = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return len(self._idle)
+
+    def acquire(self):
+        if self._idle:
+            obj = self._idle.pop()
+        else:
+            obj = self.create()
+            self.created += 1
+        self.live += 1
+        self.high_water = max(self.high_water, self.live)
+        return obj
+
+    def release(self, obj):
+        self.live -= 1
+        if len(self._idle) < self.capacity:
+            self._idle.append(obj)
+        else:
+            self._discard(obj)
+
+    def warm(self, n):
+        """Allocate until `n` objects (live and idle, at most `capacity` idle) exist."""
+        while self.live + len(self._idle) < n and len(self._idle) < self.capacity:
+            self._idle.append(self.create())
+            self.created += 1
+
+    def trim(self):
+        """Destroy idle objects not needed to reach the high-water mark, then reset it."""
+        keep = min(max(self.high_water - self.live, 0), self.capacity)
+        while len(self._idle) > keep:
+            self._discard(self._idle.pop())
+        self.high_water = self.live
+
+    def clear(self):
+        while self._idle:
+            self._discard(self._idle.pop())
+
+    def stats(self):
+        return {
+            'live': self.live,
+            'pooled': len(self._idle),
+            'created': self.created,
+            'destroyed': self.destroyed,
+            'high_water': self.high_water,
+            'capacity': self.capacity,
+        }
+
+    def _discard(self, obj):
+        self.destroy(obj)
+        self.destroyed += 1
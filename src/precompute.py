@@ -0,0 +1,80 @@
+# Ahead-of-time layout pass for a whole DanMuPool
+from array import array
+import threading
+from PySide6.QtGui import QFont, QFontMetrics
+from danmu import DanMu, TYPE_NAMES
+from lanes import ScreenLayout
+
+
+class PoolLayout:
+    """Start and end positions for every row of a pool, valid for `key`."""
+    __slots__ = ('key', 'start_x', 'start_y', 'end_x', 'end_y')
+
+    def __init__(self, key, size):
+        self.key = key
+        self.start_x = array('f', bytes(4 * size))
+        self.start_y = array('f', bytes(4 * size))
+        self.end_x = array('f', bytes(4 * size))
+        self.end_y = array('f', bytes(4 * size))
+
+    def store(self, index, danmu):
+        self.start_x[index], self.start_y[index] = danmu.start_x, danmu.start_y
+        self.end_x[index], self.end_y[index] = danmu.end_x, danmu.end_y
+
+    def apply(self, index, danmu):
+        danmu.start_x, danmu.start_y = self.start_x[index], self.start_y[index]
+        danmu.end_x, danmu.end_y = self.end_x[index], self.end_y[index]
+
+
+class LayoutPrecomputer:
+    """
+    Measure every text and run the lane assignment over the whole timeline
+    in a worker thread, then publish the result as `pool.layout`.
+
+    `key` is (screen_width, screen_height, font_size_multiplier,
+    speed_multiplier, row_height, max_rows); a layout is only used while the
+    renderer's key matches, so changing any of them triggers a new pass.
+    """
+
+    def __init__(self, pool, key):
+        self.pool = pool
+        self.key = key
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        screen_width, screen_height, font_size_multiplier, speed_multiplier, row_height, max_rows = self.key
+        columns = self.pool.danmu_list
+        layout = ScreenLayout(screen_width, screen_height, row_height, max_rows)
+        result = PoolLayout(self.key, len(columns))
+
+        font_metrics = {}
+        widths = {}
+        danmu = DanMu()
+        for index in range(len(columns)):
+            if self.cancelled:
+                return
+            text = columns.text_at(index)
+            font_size = int(columns.fontsize[index] * font_size_multiplier)
+            width = widths.get((text, font_size))
+            if width is None:
+                metrics = font_metrics.get(font_size)
+                if metrics is None:
+                    metrics = font_metrics[font_size] = QFontMetrics(QFont(DanMu.fontname, font_size))
+                width = widths[text, font_size] = metrics.horizontalAdvance(text)
+
+            # Same timing as DanMuMachine.send_one, in timeline seconds
+            start_time = columns.start_time[index]
+            duration = int((columns.end_time[index] - start_time) * 1000 / speed_multiplier)
+            danmu.type = TYPE_NAMES[columns.type[index]]
+            layout.place(danmu, width, start_time, duration / 1000.0)
+            result.store(index, danmu)
+
+        self.pool.layout = result
+        print(f"Precomputed layout for {len(columns)} DanMu.")
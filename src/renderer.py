@@ -1,140 +1,362 @@
-from PySide6.QtGui import QFont, QColor, QPainter, QFontMetrics
-from PySide6.QtCore import Qt, QPropertyAnimation, QPoint, QEasingCurve, QTimer
+from PySide6.QtGui import QFont, QColor, QPainter, QFontMetrics, QPixmap, QRegion
+from PySide6.QtCore import Qt, QPropertyAnimation, QPoint, QPointF, QEasingCurve, QRectF
 from PySide6.QtWidgets import (
-    QGraphicsView, QGraphicsScene, QGraphicsTextItem, QGraphicsItem
+    QGraphicsView, QGraphicsScene, QGraphicsObject
 )
 # from PySide6.QtOpenGLWidgets import QOpenGLWidget
-import time
 from parser import read_xml
 from danmu import DanMu, DanMuPool
-import heapq
-import random
 from settings import DanMuConfig
+from lanes import ScreenLayout
+from canvas import DanMuCanvas
+from pixmaps import PixmapCache
+from precompute import LayoutPrecomputer
+from admission import AdmissionControl, PRIORITIES
+from clock import PausableClock
+from scheduler import FrameScheduler
+from pools import ObjectPool
+from perf import PerfMonitor, PerfHUD
 
+# Seconds a scrolling comment stays on screen at speed 1, as parser.bili_xml sets it
+SCROLL_SECONDS = 8
 
-class DanMuLabel(QGraphicsTextItem):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+
+class DanMuLabel(QGraphicsObject):
+    """Blits a cached text pixmap; moved by its own animation of `pos`."""
+    def __init__(self, pixmap=None):
+        super().__init__()
+        self.pixmap = pixmap or QPixmap()
+        self.animation = QPropertyAnimation(self, b"pos", self)
+        self.animation.setEasingCurve(QEasingCurve.Linear)
+
+    def setPixmap(self, pixmap):
+        self.prepareGeometryChange()
+        self.pixmap = pixmap
+        self.update()
+
+    def boundingRect(self):
+        return QRectF(QPointF(0, 0), self.pixmap.deviceIndependentSize())
+
+    def paint(self, painter, option, widget=None):
+        painter.drawPixmap(0, 0, self.pixmap)
 
 class DanMuMachine():
     """Base class for DanMu rendering. Manager Timer, and DanMu Rendering."""
     
-    label_pool = []  # Keep track of labels to reuse when possible.
-    animations = []
-    animation_pool = []
     font_metrics_cache = {}
+    pool_trim_interval = 60  # Seconds between trims of the label pool to its recent peak
     danmu_pool: DanMuPool
 
-    def __init__(self, parent, n_workers=1):
+    def __init__(self, parent, n_workers=1, clock=None):
         self.parent = parent
+        # Pausable monotonic clock by default. An injected clock (e.g. a
+        # VirtualClock) also drives the label animations, see advance_animations.
+        self.clock = clock or PausableClock()
+        self.manual_animations = clock is not None
+        self.animation_starts = {}  # Running animation -> clock time it started
         self.view = QGraphicsView(self.parent)
         # self.view.setViewport(QOpenGLWidget()) not work.
         self.scene = QGraphicsScene()
         self.view.setScene(self.scene)
         self.view.setStyleSheet("background: transparent; border: none;")
-        self.view.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
         
         self.n_workers: int = n_workers
         self.current_index = 0
-        self.timer = None
+        self.danmu_pool = None
         self.screen_geometry = self.parent.screen_geometry.width(), self.parent.screen_geometry.height()
         self.parent.setCentralWidget(self.view)
         self.scene.setSceneRect(0, 0, self.screen_geometry[0], self.screen_geometry[1])
         
         self.config = DanMuConfig()
         self.row_height = 25
+        # With 'bands', on_frame repaints only the rows that hold danmu now
+        # or did on the last frame; an empty overlay is not repainted at all.
+        self.set_viewport_update(self.config.viewport_update)
+        self.pixmap_cache = PixmapCache(
+            self.config.pixmap_cache_mb * 1024 * 1024, self.parent.devicePixelRatioF()
+        )
+        self.scheduler = FrameScheduler(self.parent, self.on_frame, self.config.target_fps)
+        self.admission = AdmissionControl(
+            *self.admission_limits(), self.config.merge_window,
+            self.config.admission_priority, self.config.max_danmu_count,
+        )
+
+        # Batched mode paints every danmu from one item on each frame;
+        # otherwise labels are recycled, allocated up front for a full screen.
+        self.canvas = None
+        self.labels = ObjectPool(self.new_label, self.delete_label, self.config.max_danmu_count)
+        if self.config.render_mode == 'batched':
+            self.canvas = DanMuCanvas(self.screen_geometry[0], self.screen_geometry[1])
+            self.scene.addItem(self.canvas)
+        else:
+            self.labels.warm(self.config.max_danmu_count)
         
         # Overlapping management
-        self.max_scroll_rows = min(self.screen_geometry[1] // self.row_height - 1, 50)
+        self.max_scroll_rows = self.scroll_rows()
+        self.layout_job = None
+        self.screen_layout = None
+
+        # Instrumentation, attached only while the HUD is shown
+        self.perf = PerfMonitor(self)
+        self.hud = PerfHUD(self.perf)
+
+        # Settings apply live, see on_config_changed
+        self.applied_speed = self.config.speed_multiplier
+        self.config.changed.connect(self.on_config_changed)
 
         
+    def set_pool(self, pool):
+        """Switch to `pool` and play it from the start."""
+        if self.danmu_pool is not None:
+            self.clear_danmu()
+            self.labels.trim()
+        self.danmu_pool = pool
+        self.reset_time()
+
     def reset_time(self):
         self.shift_time = 0  # in seconds
-        self.start_time = time.time()
+        self.start_time = self.clock()
         self.current_danmu_id = 0
-        self.scroll_overlap_heap = [(0, i) for i in range(self.max_scroll_rows)]
-        self.fixed_top_rows = [(0, i) for i in range(self.max_scroll_rows)]
-        self.fixed_bottom_rows = [(0, i) for i in range(self.max_scroll_rows)]
-        heapq.heapify(self.scroll_overlap_heap)
+        self.pool_revision = self.danmu_pool.revision
+        self.screen_layout = ScreenLayout(
+            self.screen_geometry[0], self.screen_geometry[1], self.row_height, self.max_scroll_rows
+        )
         self.active_danmus = 0
-        
-        # Timer setup
-        if not self.timer:
-            self.timer = QTimer(self.parent)
-        self.timer.timeout.connect(self.tick)
-        self.timer.start(100)  # ~30 fps
+        self.placed_danmus = 0
+        self.dropped_danmus = 0
+        self.next_pool_trim = self.start_time + self.pool_trim_interval
+        self.admission.clear()
+        if self.clock.paused:
+            self.resume_animations()
+        self.scheduler.start()
+
+    def scroll_rows(self):
+        """Scrolling lanes that fit in the configured display area."""
+        area = int(self.screen_geometry[1] * self.config.display_area_multiplier)
+        return max(min(area // self.row_height - 1, 50), 1)
+
+    def admission_limits(self):
+        """
+        Token bucket (rate, burst) for admission control. The default 0 for
+        either derives it from max_danmu_count: the rate that, sustained for
+        a comment's time on screen, fills the screen, and twice that as burst.
+        """
+        config = self.config
+        rate = config.admission_rate or config.max_danmu_count * config.speed_multiplier / SCROLL_SECONDS
+        return rate, config.admission_burst or 2 * rate
+
+    def on_config_changed(self, name, value):
+        """Apply a setting to what is on screen without clearing it."""
+        if name in ('max_danmu_count', 'speed_multiplier', 'admission_rate', 'admission_burst'):
+            self.admission.rate, self.admission.burst = self.admission_limits()
+        if name == 'max_danmu_count':
+            self.admission.max_active = value
+            self.labels.capacity = value
+            self.labels.trim()
+        elif name == 'merge_window':
+            self.admission.merge_window = value
+        elif name == 'admission_priority':
+            self.admission.score = PRIORITIES[value]
+        elif name == 'target_fps':
+            self.scheduler.set_fps(value)
+        elif name == 'viewport_update':
+            self.set_viewport_update(value)
+        elif name == 'speed_multiplier':
+            self.retime(value / self.applied_speed)
+            self.applied_speed = value
+            self.rebuild_lanes()
+        elif name == 'display_area_multiplier':
+            self.max_scroll_rows = self.scroll_rows()
+            self.rebuild_lanes()
+
+    def retime(self, ratio):
+        """Make every danmu in flight move `ratio` times as fast from where it is now."""
+        now = self.clock()
+        if self.canvas is not None:
+            self.canvas.retime(now, ratio)
+            return
+        for anim in self.animation_starts:
+            remaining = anim.duration() - anim.currentTime()
+            if remaining <= 0:
+                continue
+            # A running animation keeps its old start value; restart it instead
+            paused = anim.state() == QPropertyAnimation.Paused
+            anim.stop()
+            anim.setStartValue(anim.targetObject().pos().toPoint())
+            anim.setDuration(max(int(remaining / ratio), 1))
+            anim.start()
+            if paused:
+                anim.pause()
+            self.animation_starts[anim] = now
+
+    def in_flight(self):
+        """(x, y, width, velocity_x, end_time) of every danmu on screen."""
+        now = self.clock()
+        if self.canvas is not None:
+            yield from self.canvas.in_flight(now)
+            return
+        for anim in self.animation_starts:
+            remaining = (anim.duration() - anim.currentTime()) / 1000
+            if remaining <= 0:
+                continue
+            label = anim.targetObject()
+            pos = label.pos()
+            yield pos.x(), pos.y(), label.pixmap.deviceIndependentSize().width(), (anim.endValue().x() - pos.x()) / remaining, now + remaining
+
+    def rebuild_lanes(self):
+        """Start a layout for the current settings that keeps out of the way of danmu in flight."""
+        if self.screen_layout is None:
+            return
+        screen_width = self.screen_geometry[0]
+        self.screen_layout = layout = ScreenLayout(
+            screen_width, self.screen_geometry[1], self.row_height, self.max_scroll_rows
+        )
+        now = self.clock()
+        for x, y, width, velocity_x, end_time in self.in_flight():
+            if velocity_x < 0:
+                layout.occupy(y, now + max(0, x + width - screen_width) / -velocity_x, end_time)
+            elif velocity_x > 0:
+                layout.occupy(y, now + max(0, -x) / velocity_x, end_time)
+            else:
+                layout.occupy(y, now, end_time, scrolling=False)
+
+    def set_viewport_update(self, strategy):
+        self.band_updates = strategy == 'bands'
+        self.painted_bands = set()
+        self.view.setViewportUpdateMode(
+            QGraphicsView.NoViewportUpdate if self.band_updates else QGraphicsView.FullViewportUpdate
+        )
+        self.view.viewport().update()
+
+    def set_hud_visible(self, visible):
+        if visible == (self.hud.scene() is not None):
+            return
+        if visible:
+            self.perf.reset()
+            self.hud.show_on(self.scene)
+        else:
+            self.hud.hide_from(self.scene)
+
+    def on_frame(self):
+        self.tick()
+        if self.clock() >= self.next_pool_trim:
+            # Give back labels a quiet stretch did not need
+            self.labels.trim()
+            self.next_pool_trim = self.clock() + self.pool_trim_interval
+        if self.canvas is not None:
+            self.paint_frame()
+        elif self.manual_animations:
+            self.advance_animations()
+        if self.band_updates:
+            self.update_bands()
+
+    def occupied_bands(self):
+        """Indices of the row_height tall bands that hold a danmu."""
+        row_height = self.row_height
+        bands = set()
+        if self.canvas is not None:
+            spans = ((y, pixmap.deviceIndependentSize().height()) for y, pixmap in zip(self.canvas.start_y, self.canvas.pixmaps))
+        else:
+            spans = (
+                (anim.targetObject().y(), anim.targetObject().pixmap.deviceIndependentSize().height()) for anim in self.animation_starts
+            )
+        for y, height in spans:
+            bands.update(range(int(y // row_height), int((y + height) // row_height) + 1))
+        return bands
+
+    def update_bands(self):
+        """Repaint the bands that hold danmu, plus the ones that just emptied."""
+        bands = self.occupied_bands()
+        dirty = bands | self.painted_bands
+        self.painted_bands = bands
+        if not dirty:
+            return
+        runs = []  # [first, last] band of each contiguous run
+        for band in sorted(dirty):
+            if runs and band == runs[-1][1] + 1:
+                runs[-1][1] = band
+            else:
+                runs.append([band, band])
+        width, row_height = self.screen_geometry[0], self.row_height
+        region = QRegion()
+        for first, last in runs:
+            rect = QRectF(0, first * row_height, width, (last - first + 1) * row_height)
+            region += self.view.mapFromScene(rect).boundingRect()
+        self.view.viewport().update(region)
     
     def tick(self):
-        now = time.time()
+        now = self.clock()
         elapsed = now - self.start_time + self.shift_time
 
-        # Send DanMus that are due
+        # A streaming loader merged an out-of-order chunk; re-find our position.
+        if self.danmu_pool.revision != self.pool_revision:
+            self.pool_revision = self.danmu_pool.revision
+            self.update_current_danmu_id()
+
+        # Send DanMus that are due. Each one starts at the clock time it was
+        # due rather than now, so motion is not quantized to the frame interval.
+        layout = self.current_layout()
+        danmu_list = self.danmu_pool.danmu_list
+        start_times = danmu_list.start_time
         pending_danmus = []
         while (
-            self.current_danmu_id < len(self.danmu_pool) and
-            elapsed >= self.danmu_pool.danmu_list[self.current_danmu_id].start_time
+            self.current_danmu_id < len(start_times) and
+            elapsed >= start_times[self.current_danmu_id]
         ):
-            pending_danmus.append(self.danmu_pool.danmu_list[self.current_danmu_id])
+            danmu = danmu_list[self.current_danmu_id]
+            if layout is not None:
+                layout.apply(self.current_danmu_id, danmu)
+            due_time = now - (elapsed - start_times[self.current_danmu_id])
+            pending_danmus.append((danmu, due_time))
             self.current_danmu_id += 1
             
-        self.send_batch(pending_danmus, now)
+        self.send_batch(pending_danmus, now, laid_out=layout is not None)
     
     
-    def send_batch(self, danmu_list, current_time):
-        for danmu in danmu_list[:50]:
-            self.send_one(danmu, current_time)
+    def send_batch(self, danmu_list, current_time, laid_out=False):
+        """
+        Pass (danmu, due_time) pairs through admission control and send what
+        it releases; due_time is a clock time.
+        """
+        admission = self.admission
+        for danmu, due_time in danmu_list:
+            admission.offer(danmu, due_time, laid_out)
+        shed = admission.shed
+        for danmu, due_time, laid_out in admission.admit(current_time, self.active_danmus):
+            self.send_one(danmu, due_time, laid_out)
+        self.dropped_danmus += admission.shed - shed
+    
+    def layout_key(self):
+        return (
+            self.screen_geometry[0], self.screen_geometry[1], self.config.font_size_multiplier,
+            self.config.speed_multiplier, self.row_height, self.max_scroll_rows,
+        )
+
+    def current_layout(self):
+        """
+        The pool's precomputed layout if it matches the current settings. A
+        missing or stale layout schedules a new pass and returns None, so the
+        live placement is used until it is ready.
+        """
+        if not self.config.precompute_layout:
+            return None
+        pool, key = self.danmu_pool, self.layout_key()
+        if pool.layout is not None and pool.layout.key == key:
+            return pool.layout
+        job = self.layout_job
+        if not pool.loading and (job is None or job.pool is not pool or job.key != key):
+            if job is not None:
+                job.cancel()
+            self.layout_job = LayoutPrecomputer(pool, key)
+            self.layout_job.start()
+        return None
     
     
     def calculate_initial_position(
         self, danmu, screen_width, screen_height, text_width, text_height, current_time, duration_in_seconds
     ):
         """Calculate the initial position for DanMu to avoid overlap."""
-        # Constants for positioning
-        TOP_MARGIN = 25
-        BOTTOM_MARGIN = 50
-        
-        if danmu.type in ['R2L', 'L2R']:  # Scrolls
-            available_time, n_row = heapq.heappop(self.scroll_overlap_heap)
-            danmu.start_y = n_row * self.row_height + TOP_MARGIN
-            danmu.end_y = danmu.start_y
-            # Update the available time for this row
-            new_available_time = current_time + duration_in_seconds / 5
-            heapq.heappush(self.scroll_overlap_heap, (new_available_time, n_row))
-            
-            if danmu.type == 'R2L':  # Right to Left
-                danmu.start_x = screen_width
-                danmu.end_x = - text_width
-            else:
-                danmu.start_x = -text_width
-                danmu.end_x = screen_width            
-
-        elif danmu.type == 'TOP':  # Fixed Top
-            # Allocate the next available row for fixed top
-            if self.fixed_top_rows:
-                available_time, row = heapq.heappop(self.fixed_top_rows)
-            else:
-                row = 0
-            danmu.start_x = (screen_width - text_width) / 2
-            danmu.end_x = danmu.start_x  # Fixed position
-            danmu.start_y = row * self.row_height + TOP_MARGIN
-            danmu.end_y = danmu.start_y
-            new_available_time = current_time + duration_in_seconds
-            heapq.heappush(self.fixed_top_rows, (new_available_time, row))
-            
-        elif danmu.type == 'BOTTOM':  # Fixed Bottom
-            if self.fixed_bottom_rows:
-                available_time, row = heapq.heappop(self.fixed_bottom_rows)
-            else:
-                row = 0
-            danmu.start_x = (screen_width - text_width) / 2
-            danmu.end_x = danmu.start_x  # Fixed position
-            danmu.start_y = screen_height - BOTTOM_MARGIN - ((row + 1) * self.row_height)
-            danmu.end_y = danmu.start_y
-            new_available_time = current_time + duration_in_seconds
-            heapq.heappush(self.fixed_bottom_rows, (new_available_time, row))
-
-        # Ensure rows don't exceed screen height or become negative
-        danmu.start_y = max(0, min(danmu.start_y, screen_height - BOTTOM_MARGIN - self.row_height))
+        self.screen_layout.place(danmu, text_width, current_time, duration_in_seconds)
 
 
     def get_font_metrics(self, fontname, fontsize: int):
@@ -144,75 +366,110 @@ class DanMuMachine():
             self.font_metrics_cache[key] = QFontMetrics(font)
         return self.font_metrics_cache[key]
     
-    def create_label(self, text, text_width, text_height):
-        if self.label_pool:
-            label = self.label_pool.pop()
-            label.setPlainText(text)
-        else:
-            label = QGraphicsTextItem(text)
-            label.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
-            self.scene.addItem(label)
+    def new_label(self):
+        label = DanMuLabel()
+        label.hide()
+        self.scene.addItem(label)
+        label.animation.finished.connect(lambda: self.recycle(label))
         return label
+
+    def delete_label(self, label):
+        label.animation.stop()
+        self.scene.removeItem(label)
+        label.deleteLater()
+
+    def recycle(self, label):
+        """Return a label whose animation finished or was stopped to the pool."""
+        self.animation_starts.pop(label.animation, None)
+        label.hide()
+        self.labels.release(label)
+        self.active_danmus -= 1
+
+    def pool_stats(self):
+        """Label pool counters; `leaked` counts labels in use but not on screen."""
+        stats = self.labels.stats()
+        stats['leaked'] = stats['live'] - len(self.animation_starts)
+        return stats
     
-    def send_one(self, danmu_item: DanMu, current_time):
-        acceptance_prob = 2.0 - (self.active_danmus / self.config.max_danmu_count)
-        if random.random() > acceptance_prob:
-            return  # Soft reject, skip to next danmu
+    def send_one(self, danmu_item: DanMu, current_time, laid_out=False):
         duration = int(
             (danmu_item.end_time - danmu_item.start_time) * 1000 / self.config.speed_multiplier
         )  # Duration in milliseconds
         duration_in_seconds = duration / 1000.0
-        # Font metrics
         font_size = int(danmu_item.fontsize * self.config.font_size_multiplier)
-        font_metrics = self.get_font_metrics(danmu_item.fontname, font_size)
-        text_width = font_metrics.horizontalAdvance(danmu_item.text)
-        text_height = font_metrics.height()
-        
-        # Start and end positions
-        self.calculate_initial_position(
-            danmu_item, self.screen_geometry[0], self.screen_geometry[1], text_width, text_height,
-            current_time, duration_in_seconds,
+        if not laid_out:
+            # Font metrics
+            font_metrics = self.get_font_metrics(danmu_item.fontname, font_size)
+            text_width = font_metrics.horizontalAdvance(danmu_item.text)
+            text_height = font_metrics.height()
+            
+            # Start and end positions
+            self.calculate_initial_position(
+                danmu_item, self.screen_geometry[0], self.screen_geometry[1], text_width, text_height,
+                current_time, duration_in_seconds,
+            )
+
+        pixmap = self.pixmap_cache.get(
+            danmu_item.text, QFont(danmu_item.fontname, font_size), QColor(*danmu_item.color),
+            self.config.outline_width,
         )
+        if self.canvas is not None:
+            self.canvas.add(
+                pixmap, (danmu_item.start_x, danmu_item.start_y), (danmu_item.end_x, danmu_item.end_y),
+                current_time, duration_in_seconds,
+            )
+            self.active_danmus = len(self.canvas)
+            self.placed_danmus += 1
+            return
 
-        # Create label
-        label = self.create_label(danmu_item.text, text_width, text_height)
-        label.setDefaultTextColor(QColor(danmu_item.color[0], danmu_item.color[1], danmu_item.color[2], danmu_item.color[3]))
-        label.setFont(QFont(danmu_item.fontname, font_size))
+        label = self.labels.acquire()
+        label.setPixmap(pixmap)
         label.show()
 
         # Start animation
-        self.fly(label, duration, (danmu_item.start_x, danmu_item.start_y), (danmu_item.end_x, danmu_item.end_y))
+        self.fly(
+            label, duration, (danmu_item.start_x, danmu_item.start_y), (danmu_item.end_x, danmu_item.end_y),
+            current_time,
+        )
+        self.placed_danmus += 1
 
-    def fly(self, label, duration, start_pos, end_pos):
-        if len(self.animation_pool) > 3:
-            anim = self.animation_pool.pop()
-            if anim.state() != QPropertyAnimation.Stopped: anim.stop()
-            anim.setTargetObject(label)
-        else:
-            anim = QPropertyAnimation(label, b"pos", self.parent)
-        
+    def fly(self, label, duration, start_pos, end_pos, start_time=None):
+        """Animate `label`; a `start_time` in the past starts it part way through."""
+        if start_time is None:
+            start_time = self.clock()
+        anim = label.animation
         anim.setDuration(duration)
         anim.setStartValue(QPoint(*start_pos))
         anim.setEndValue(QPoint(*end_pos))
-        anim.setEasingCurve(QEasingCurve.Linear)
-        
-        def on_finished():
-            if label.isVisible(): label.hide()
-            label.update()
-            self.label_pool.append(label)
-            self.animation_pool.append(anim)
-            self.active_danmus -= 1
-            anim.finished.disconnect()
-        
-        anim.finished.connect(on_finished)
-        anim.start()
+
+        # Counted before starting, as a late start may finish it right away
         self.active_danmus += 1
+        anim.start()
+        self.animation_starts[anim] = start_time
+        if self.manual_animations:
+            anim.pause()
+        else:
+            late = int((self.clock() - start_time) * 1000)
+            if late > 0:
+                anim.setCurrentTime(late)
+
+    def advance_animations(self):
+        """Step label animations to the injected clock (manual animation mode only)."""
+        now = self.clock()
+        for anim, start_time in list(self.animation_starts.items()):
+            anim.setCurrentTime(int((now - start_time) * 1000))
+
+    def paint_frame(self):
+        self.canvas.advance_to(self.clock())
+        self.active_danmus = len(self.canvas)
 
     def get_current_time(self):
-        now = time.time()
+        now = self.clock()
         return now - self.start_time + self.shift_time
 
     def get_total_time(self):
+        if not self.danmu_pool:
+            return 0.0
         return self.danmu_pool.danmu_list[-1].end_time
 
     def rewind(self, seconds=2):
@@ -226,33 +483,58 @@ class DanMuMachine():
         self.clear_danmu()
         
     def play_pause(self):
-        if self.timer.isActive():
-            self.timer.stop()
+        # Stopping the clock freezes the timeline, so resuming neither jumps
+        # ahead nor drifts; Qt-driven animations are paused alongside it.
+        if self.clock.paused:
+            self.resume_animations()
+            self.scheduler.start()
         else:
-            self.timer.start()
+            self.scheduler.stop()
+            self.clock.pause()
+            if not self.manual_animations:
+                for anim in self.animation_starts:
+                    anim.pause()
         
-    def jump_to_percentage(self, percentage):
-        self.current_danmu_id = int(len(self.danmu_pool.danmu_list) * (percentage / 100))
-        self.shift_time = self.danmu_pool.danmu_list[self.current_danmu_id].start_time - (time.time() - self.start_time)
+    def resume_animations(self):
+        """Resume the clock and the Qt-driven animations paused with it."""
+        self.clock.resume()
+        if not self.manual_animations:
+            for anim in self.animation_starts:
+                anim.resume()
+
+    def jump_to_percentage(self, percentage, by_time=False):
+        """Seek to `percentage` of the comments, or of the total time with `by_time`."""
+        if not self.danmu_pool:
+            return
+        if by_time:
+            target_time = self.get_total_time() * (percentage / 100)
+            self.current_danmu_id = self.danmu_pool.index_at(target_time)
+        else:
+            self.current_danmu_id = min(
+                int(len(self.danmu_pool.danmu_list) * (percentage / 100)), len(self.danmu_pool) - 1
+            )
+            target_time = self.danmu_pool.danmu_list.start_time[self.current_danmu_id]
+        self.shift_time = target_time - (self.clock() - self.start_time)
         self.clear_danmu()
 
     def update_current_danmu_id(self):
         # Update current_danmu_id based on the new shift_time
-        elapsed = time.time() - self.start_time + self.shift_time
-        self.current_danmu_id = next(
-            (i for i, danmu in enumerate(self.danmu_pool.danmu_list) if danmu.start_time >= elapsed),
-            len(self.danmu_pool.danmu_list)
-        )
+        elapsed = self.clock() - self.start_time + self.shift_time
+        self.current_danmu_id = self.danmu_pool.index_at(elapsed)
 
     def clear_danmu(self):
-        # Remove all labels and animations
-        for anim in self.animation_pool:
+        # Take every danmu off screen; labels go back to the pool for reuse
+        for anim in list(self.animation_starts):
             anim.stop()
-        self.animation_pool.clear()
-        for label in self.label_pool:
-            label.deleteLater()
-        self.label_pool.clear()
-        self.scene.clear()
+            self.recycle(anim.targetObject())
+        if self.canvas is not None:
+            self.canvas.clear()
+            self.active_danmus = 0
+        self.screen_layout.clear()
+        self.admission.clear()
+        if self.band_updates and not self.scheduler.isActive():
+            # Paused: no frame will come to erase what was on screen
+            self.update_bands()
     
 
 if __name__ == '__main__':
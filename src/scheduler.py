@@ -0,0 +1,32 @@
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QGuiApplication
+
+
+class FrameScheduler:
+    """
+    Calls `callback` once per frame on a precise timer. With no explicit
+    `fps` the primary screen's refresh rate is used, so frames come at the
+    display's vsync cadence instead of a fixed 100 ms tick.
+    """
+
+    def __init__(self, parent, callback, fps=0):
+        self.timer = QTimer(parent)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(callback)
+        self.set_fps(fps)
+
+    def set_fps(self, fps=0):
+        if not fps:
+            screen = QGuiApplication.primaryScreen()
+            fps = screen.refreshRate() if screen and screen.refreshRate() > 0 else 60
+        self.fps = fps
+        self.timer.setInterval(max(round(1000 / fps), 1))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def isActive(self):
+        return self.timer.isActive()
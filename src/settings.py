@@ -1,15 +1,38 @@
 from PySide6.QtWidgets import (
     QMainWindow, QLabel, QSpinBox, QTimeEdit,
-    QDialog, QVBoxLayout, QHBoxLayout, QDoubleSpinBox, QDialogButtonBox, QPushButton, QSlider, QTabWidget, QWidget
+    QDialog, QVBoxLayout, QHBoxLayout, QDoubleSpinBox, QDialogButtonBox, QPushButton, QSlider, QTabWidget, QWidget,
+    QCheckBox,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, Signal
 
 
-class DanMuConfig:
+class DanMuConfig(QObject):
+    """
+    Settings of one DanMuMachine. Class attributes are the defaults; change a
+    live setting with set() so `changed(name, value)` reaches the machine.
+    """
+    changed = Signal(str, object)
+
     speed_multiplier = 1.0
     font_size_multiplier = 1.0
-    display_area_multiplier = 1.0
+    display_area_multiplier = 1.0  # Fraction of the screen height used for scrolling danmu
     max_danmu_count = 300
+    outline_width = 0
+    pixmap_cache_mb = 64
+    precompute_layout = False  # Lay out the whole file in a worker thread ahead of playback
+    render_mode = 'items'  # 'items': one text item + animation per danmu, 'batched': one canvas for all
+    target_fps = 0  # Frames per second, 0 follows the screen refresh rate
+    admission_rate = 0  # Comments admitted per second, see admission.AdmissionControl; 0 keeps up with max_danmu_count
+    admission_burst = 0  # Most admitted at once; 0 for twice the rate
+    merge_window = 0  # Seconds to merge identical comments into one "×N"; delays every comment by as much
+    admission_priority = 'none'  # Which comments survive overload: 'none', 'rare' or 'long'
+    load_workers = 0  # Processes parsing large XML files opened during playback, 0 for one per CPU
+    viewport_update = 'bands'  # 'bands' repaints only the rows holding danmu, 'full' the whole view every frame
+
+    def set(self, name, value):
+        if getattr(self, name) != value:
+            setattr(self, name, value)
+            self.changed.emit(name, value)
     
 
 def settings_dialog(window: QMainWindow):
@@ -19,6 +42,10 @@ def settings_dialog(window: QMainWindow):
     dialog.resize(400, 300)
     
     danmu_machine = window.danmu_machine
+    # Changes apply live; Cancel restores these
+    config = danmu_machine.config
+    live_settings = ('max_danmu_count', 'display_area_multiplier', 'font_size_multiplier', 'speed_multiplier')
+    original = {name: getattr(config, name) for name in live_settings}
 
     # Create tabs
     tabs = QTabWidget()
@@ -33,6 +60,7 @@ def settings_dialog(window: QMainWindow):
     max_danmu_selector.setRange(50, 500)
     max_danmu_selector.setSingleStep(50)
     max_danmu_selector.setValue(danmu_machine.config.max_danmu_count)
+    max_danmu_selector.valueChanged.connect(lambda value: config.set('max_danmu_count', value))
     general_layout.addWidget(max_danmu_label)
     general_layout.addWidget(max_danmu_selector)
     
@@ -41,7 +69,9 @@ def settings_dialog(window: QMainWindow):
     display_area_label.setAlignment(Qt.AlignRight | Qt.AlignBottom)
     display_area_SpinBox = QSpinBox()
     display_area_SpinBox.setRange(10, 100)
-    display_area_SpinBox.setValue(danmu_machine.config.display_area_multiplier)
+    display_area_SpinBox.setSuffix("%")
+    display_area_SpinBox.setValue(round(danmu_machine.config.display_area_multiplier * 100))
+    display_area_SpinBox.valueChanged.connect(lambda value: config.set('display_area_multiplier', value / 100))
     general_layout.addWidget(display_area_label)
     general_layout.addWidget(display_area_SpinBox)
 
@@ -53,7 +83,7 @@ def settings_dialog(window: QMainWindow):
     font_size_doubleSpinBox.setValue(danmu_machine.config.font_size_multiplier)
     font_size_doubleSpinBox.setSingleStep(0.1)
     font_size_doubleSpinBox.setDecimals(1)
-    # font_size_doubleSpinBox.valueChanged.connect(lambda value: window.config.font_size_multiplier = value)
+    font_size_doubleSpinBox.valueChanged.connect(lambda value: config.set('font_size_multiplier', value))
     general_layout.addWidget(font_size_label)
     general_layout.addWidget(font_size_doubleSpinBox)
     
@@ -65,7 +95,7 @@ def settings_dialog(window: QMainWindow):
     speed_doubleSpinBox.setValue(danmu_machine.config.speed_multiplier)
     speed_doubleSpinBox.setSingleStep(0.1)
     speed_doubleSpinBox.setDecimals(1)
-    # speed_doubleSpinBox.valueChanged.connect(lambda value: window.config.speed_multiplier = value)
+    speed_doubleSpinBox.valueChanged.connect(lambda value: config.set('speed_multiplier', value))
     general_layout.addWidget(speed_label)
     general_layout.addWidget(speed_doubleSpinBox)
     
@@ -107,16 +137,19 @@ def settings_dialog(window: QMainWindow):
     progress_label = QLabel("Jump to:")
     progress_input = QSlider(Qt.Horizontal)
     progress_input.setRange(0, 100)
-    current_percentage = int((danmu_machine.current_danmu_id / len(danmu_machine.danmu_pool.danmu_list)) * 100)
+    current_percentage = int((danmu_machine.current_danmu_id / max(len(danmu_machine.danmu_pool or ()), 1)) * 100)
     progress_input.setValue(current_percentage)
+    by_time_input = QCheckBox("By time")
+    by_time_input.setToolTip("Jump to a share of the total time instead of the comments")
     
     progress_layout.addWidget(progress_label)
     progress_layout.addWidget(progress_input)
+    progress_layout.addWidget(by_time_input)
     progress_layout.addLayout(playback_layout)
     general_layout.addLayout(progress_layout)
 
     def on_progress_changed(value):
-        danmu_machine.jump_to_percentage(value)
+        danmu_machine.jump_to_percentage(value, by_time=by_time_input.isChecked())
         current_time_label.setText(f"Current Time: {danmu_machine.get_current_time():.2f}s")
     
     progress_input.valueChanged.connect(on_progress_changed)
@@ -138,7 +171,7 @@ def settings_dialog(window: QMainWindow):
     main_layout.addWidget(button_box)
     dialog.setLayout(main_layout)
     
-    if dialog.exec() == QDialog.Accepted:
-        danmu_machine.config.font_size_multiplier = font_size_doubleSpinBox.value()
-        danmu_machine.config.speed_multiplier = speed_doubleSpinBox.value()
+    if dialog.exec() != QDialog.Accepted:
+        for name, value in original.items():
+            config.set(name, value)
     
\ No newline at end of file
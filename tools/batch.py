@@ -0,0 +1,102 @@
+# Batch mode shared by the converters in this directory: expand directories
+# and globs into input files, skip outputs that are newer than their input,
+# and convert the rest in a process pool.
+import argparse
+import os
+import sys
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def expand_inputs(patterns, extensions=('.xml',)):
+    """Files matching `patterns` (files, directories or globs), in order and without repeats."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(os.path.join(pattern, f) for f in os.listdir(pattern))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+        files += [f for f in matches if os.path.isfile(f) and f.lower().endswith(extensions)]
+    return list(dict.fromkeys(files))
+
+def is_batch(patterns):
+    return len(patterns) > 1 or not os.path.isfile(patterns[0])
+
+def output_path(input_file, output_dir=None, extension='.ass'):
+    """`input_file` with `extension`, in `output_dir` if given or next to the input."""
+    name = os.path.splitext(os.path.basename(input_file))[0] + extension
+    return os.path.join(output_dir or os.path.dirname(input_file), name)
+
+def _at_least(minimum):
+    def parse(value):
+        number = int(value)
+        if number < minimum:
+            raise argparse.ArgumentTypeError(f'must be at least {minimum}, got {value}')
+        return number
+    return parse
+
+# argparse types for job counts
+positive_int = _at_least(1)
+non_negative_int = _at_least(0)
+
+def is_up_to_date(input_file, output_file):
+    return os.path.isfile(output_file) and os.path.getmtime(output_file) >= os.path.getmtime(input_file)
+
+def run_batch(convert, patterns, output_dir=None, jobs=None, force=False, extension='.ass'):
+    """
+    Convert every input matched by `patterns` with `convert(input, output)`,
+    which must be a module-level function returning the number of comments
+    converted; a converter that raises or returns None has failed. Returns
+    the number of failed files, or 1 if nothing matched `patterns`.
+    """
+    inputs = expand_inputs(patterns)
+    if not inputs:
+        print(f"Error: No XML files found in {' '.join(patterns)}.", file=sys.stderr)
+        return 1
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    pairs, outputs, failed = [], {}, 0
+    for src in inputs:
+        dst = output_path(src, output_dir, extension)
+        if dst in outputs:
+            failed += 1
+            print(f"Error: '{src}' and '{outputs[dst]}' would both be written to '{dst}', skipping the former.", file=sys.stderr)
+            continue
+        outputs[dst] = src
+        pairs.append((src, dst))
+    todo = [(src, dst) for src, dst in pairs if force or not is_up_to_date(src, dst)]
+    skipped = len(pairs) - len(todo)
+
+    started, run_started = time.perf_counter(), time.time()
+    done = comments = 0
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        futures = {executor.submit(convert, src, dst): (src, dst) for src, dst in todo}
+        for future in as_completed(futures):
+            src, dst = futures[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                count = None
+                print(f"Error: Failed to convert '{src}'. {e}", file=sys.stderr)
+            if count is None:
+                failed += 1
+                # A partial output written by this run would look up to date next time
+                if os.path.isfile(dst) and os.path.getmtime(dst) >= run_started:
+                    os.remove(dst)
+            else:
+                comments += count
+                done += 1
+            print(f"Converted {done} of {len(todo)} files", end='\r', file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    print(file=sys.stderr)
+    print(
+        f"{done} converted, {skipped} up to date, {failed} failed in {elapsed:.2f}s "
+        f"({done / elapsed if elapsed else 0:.1f} files/s, {comments / elapsed if elapsed else 0:.0f} comments/s).",
+        file=sys.stderr,
+    )
+    return failed
@@ -0,0 +1,211 @@
+import os
+import math
+import sys
+import json
+import random
+import argparse
+import subprocess
+import time
+
+# Headless by default; must be set before Qt is imported.
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SAMPLE_TEXTS = ['哈哈哈', '233333', '前方高能', 'awsl', '？？？', '好耶', 'hello world', '这是一条比较长的测试弹幕，用来占满一整行']
+SAMPLE_COLORS = [(255, 255, 255, 204), (255, 0, 0, 204), (0, 255, 255, 204), (255, 255, 0, 204)]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def synthetic_pool(density, duration, seed):
+    from danmu import DanMu, DanMuPool
+    rng = random.Random(seed)
+    danmus = []
+    for _ in range(int(density * duration)):
+        start = rng.uniform(0, duration)
+        kind = rng.choices(['R2L', 'L2R', 'TOP', 'BOTTOM'], weights=[85, 3, 6, 6])[0]
+        length = 8 if kind in ('R2L', 'L2R') else 4
+        danmus.append(DanMu(kind, rng.choice(SAMPLE_TEXTS), start, start + length, color=rng.choice(SAMPLE_COLORS)))
+    return DanMuPool(danmus)
+
+def run_workload(spec):
+    """Replay one workload in this process and return its metrics."""
+    from PySide6.QtWidgets import QApplication, QMainWindow
+    from PySide6.QtCore import QRect
+    import parser
+    import settings
+    from renderer import DanMuMachine, SCROLL_SECONDS
+    from clock import VirtualClock
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    class BenchWindow(QMainWindow):
+        def __init__(self, width, height):
+            super().__init__()
+            self.screen_geometry = QRect(0, 0, width, height)
+            self.setGeometry(self.screen_geometry)
+
+    window = BenchWindow(*spec['screen'])
+    window.show()
+
+    if spec.get('xml'):
+        pool = parser.read_xml(spec['xml'])
+    else:
+        pool = synthetic_pool(spec['density'], spec['duration'], spec['seed'])
+
+    # Lift the on-screen cap and admission above what the workload can use,
+    # so the dense workloads measure the renderer rather than the shedding
+    density = spec.get('density') or len(pool) / max(pool.danmu_list[-1].end_time if len(pool) else 0, 1)
+    limit = max(math.ceil(density * SCROLL_SECONDS), settings.DanMuConfig.max_danmu_count)
+    limits = {'max_danmu_count': limit, 'admission_rate': limit, 'admission_burst': limit}
+    for name, value in {'render_mode': spec['mode'], **limits}.items():
+        setattr(settings.DanMuConfig, name, value)
+
+    clock = VirtualClock()
+    machine = DanMuMachine(window, clock=clock)
+    machine.danmu_pool = pool
+    machine.reset_time()
+    # The benchmark drives every frame itself.
+    machine.scheduler.stop()
+
+    frame_interval = 1.0 / spec['fps']
+    n_frames = int(spec['duration'] * spec['fps'])
+    tick_times, frame_times = [], []
+    max_active = 0
+    started = time.perf_counter()
+    for _ in range(n_frames):
+        clock.advance(frame_interval)
+        frame_start = time.perf_counter()
+        machine.tick()
+        tick_times.append(time.perf_counter() - frame_start)
+        if machine.canvas is not None:
+            machine.paint_frame()
+        else:
+            machine.advance_animations()
+        app.processEvents()
+        frame_times.append(time.perf_counter() - frame_start)
+        max_active = max(max_active, machine.active_danmus)
+    wall = time.perf_counter() - started
+
+    window.close()
+    to_ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'workload': os.path.basename(spec['xml']) if spec.get('xml') else f"synthetic-{spec['density']}/s",
+        'mode': spec['mode'],
+        'screen': '{}x{}'.format(*spec['screen']),
+        'duration': spec['duration'],
+        'limits': limits,
+        'comments': machine.current_danmu_id,
+        'frames': n_frames,
+        'fps': round(n_frames / wall, 2) if wall else None,
+        'tick_ms': {q: to_ms(percentile(tick_times, v)) for q, v in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        'frame_ms': {q: to_ms(percentile(frame_times, v)) for q, v in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        'placed': machine.placed_danmus,
+        'dropped': machine.dropped_danmus,
+        'merged': machine.admission.merged,
+        'max_active': max_active,
+        'label_pool': machine.pool_stats(),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+# Report fields compared against a baseline; lower is better for all of them
+COMPARED = (('frame_ms', 'p95'), ('tick_ms', 'p95'), ('peak_rss_mb', None))
+
+def compare(results, baseline, tolerance, slack_ms=0.5):
+    """
+    Regressions of `results` against a `baseline` report: a compared value
+    more than `tolerance` (a fraction) above the baseline, ignoring timing
+    differences under `slack_ms`. Returns a list of messages.
+    """
+    # Runs under different limits do different work, so they are not compared
+    key = lambda result: (
+        result['workload'], result['mode'], result['screen'], result['duration'],
+        tuple(sorted(result.get('limits', {}).items())),
+    )
+    previous = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        for field, quantile in COMPARED:
+            new_value = result[field] if quantile is None else result[field][quantile]
+            old_value = old[field] if quantile is None else old[field][quantile]
+            if new_value is None or old_value is None:
+                continue
+            slack = slack_ms if field.endswith('_ms') else 0
+            name = f"{field}.{quantile}" if quantile else field
+            label = f"{result['workload']} ({result['mode']}) {name}: {old_value} -> {new_value}"
+            if new_value > old_value * (1 + tolerance) + slack:
+                regressions.append(label)
+            print(label, file=sys.stderr)
+    return regressions
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Benchmark DanMuMachine rendering headlessly with a virtual clock.')
+    parser.add_argument('-d', '--density', type=int, nargs='*', default=[100, 500, 2000], help='Synthetic comments per second.')
+    parser.add_argument('-x', '--xml', type=str, nargs='*', default=[], help='Real XML files to replay.')
+    parser.add_argument('-t', '--duration', type=float, default=20, help='Seconds of virtual time per workload.')
+    parser.add_argument('-f', '--fps', type=int, default=60, help='Frames per virtual second.')
+    parser.add_argument('-m', '--mode', type=str, nargs='*', default=['items', 'batched'], help='Render modes to compare.')
+    parser.add_argument('-s', '--screen', type=str, default='1920x1080', help='Virtual screen size.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for synthetic workloads.')
+    parser.add_argument('-o', '--output_file', type=str, default=None, help='Write the JSON report here instead of stdout.')
+    parser.add_argument('-b', '--baseline', type=str, default=None, help='Compare against this JSON report and exit with 1 on a regression.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown or growth against the baseline, as a fraction.')
+    parser.add_argument('--run', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.run:
+        # Child process: one workload, so peak RSS is per workload.
+        print(json.dumps(run_workload(json.loads(args.run))))
+        return
+
+    screen = [int(v) for v in args.screen.lower().split('x')]
+    base = {'duration': args.duration, 'fps': args.fps, 'screen': screen, 'seed': args.seed}
+    specs = [{**base, 'mode': mode, 'density': density} for mode in args.mode for density in args.density]
+    specs += [{**base, 'mode': mode, 'xml': os.path.abspath(xml)} for mode in args.mode for xml in args.xml]
+
+    results = []
+    for spec in specs:
+        print(f"Running {spec.get('xml') or str(spec['density']) + '/s'} ({spec['mode']})...", file=sys.stderr)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run', json.dumps(spec)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output_file:
+        with open(args.output_file, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
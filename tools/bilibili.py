@@ -2,10 +2,19 @@ import math
 import sys
 import re
 import argparse
+import os
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
-from collections import deque
-from heapq import heappush, heappop
+import functools
+from functools import lru_cache
+import batch
+import vectorized
+
+try:
+    from fontTools.ttLib import TTFont
+except ImportError:
+    TTFont = None
 
 # Configuration dictionary
 config = {
@@ -26,6 +35,7 @@ config = {
     'max_delay': 6,
     'bottom': 50,
     'use_canvas': None,
+    'font_file': None,  # TTF/OTF/TTC used for text widths, needs fontTools
     'debug': False
 }
 
@@ -43,9 +53,72 @@ def hexAlpha(opacity):
 def hypot(*args):
     return math.hypot(*args)
 
+# Advance widths of printable ASCII (0x20-0x7E) in 1/1000 em, from the
+# Helvetica-Bold metrics, a close stand-in for the bold Latin of the CJK UI
+# fonts in `fontlist` when no font file is given.
+ASCII_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+
+# Ranges drawn one em wide: CJK, kana, hangul, fullwidth forms, emoji
+FULL_WIDTH_RANGES = (
+    (0x1100, 0x115F), (0x2E80, 0x303E), (0x3041, 0x33FF), (0x3400, 0x4DBF),
+    (0x4E00, 0x9FFF), (0xA000, 0xA4CF), (0xAC00, 0xD7A3), (0xF900, 0xFAFF),
+    (0xFE30, 0xFE4F), (0xFF00, 0xFF60), (0xFFE0, 0xFFE6), (0x1F300, 0x1FAFF),
+    (0x20000, 0x3FFFD),
+)
+
+class GlyphWidths:
+    """
+    Per character advance widths in em. Read from `font_file` with fontTools
+    when both are available, otherwise from ASCII_WIDTHS and
+    FULL_WIDTH_RANGES; characters missing from the font fall back the same way.
+    """
+    def __init__(self, font_file=None):
+        self.widths = {chr(0x20 + i): w / 1000 for i, w in enumerate(ASCII_WIDTHS)}
+        if font_file:
+            self.widths.update(self.load_font(font_file))
+
+    @staticmethod
+    def load_font(font_file):
+        if TTFont is None:
+            print('Warning: fontTools is not installed, using the built-in width table.', file=sys.stderr)
+            return {}
+        font = TTFont(font_file, fontNumber=0, lazy=True)
+        upem = font['head'].unitsPerEm
+        metrics = font['hmtx'].metrics
+        return {chr(cp): metrics[glyph][0] / upem for cp, glyph in font.getBestCmap().items()}
+
+    def __getitem__(self, char):
+        width = self.widths.get(char)
+        if width is None:
+            cp = ord(char)
+            if any(lo <= cp <= hi for lo, hi in FULL_WIDTH_RANGES):
+                width = 1.0
+            elif cp < 0x300 or 0x370 <= cp < 0x2000:
+                width = 0.6  # Other alphabets
+            else:
+                width = 1.0
+            self.widths[char] = width
+        return width
+
+@lru_cache(maxsize=8)
+def glyph_widths(font_file):
+    return GlyphWidths(font_file)
+
 def calc_width(text, fontsize):
-    # Simplistic assumption: each character width = fontsize
-    return len(text) * fontsize
+    return _calc_width(text, fontsize, config['font_file'])
+
+# Keyed on the font file too, so changing config['font_file'] takes effect
+@lru_cache(maxsize=65536)
+def _calc_width(text, fontsize, font_file):
+    widths = glyph_widths(font_file)
+    return round(sum(widths[char] for char in text) * fontsize)
 
 def chose_font(fontlist):
     # Placeholder function since font availability check requires GUI or specific libraries.
@@ -65,6 +138,15 @@ def format_time(time):
     milliseconds = int((time * 100) % 100)
     return f'{hours:01}:{minutes:02}:{seconds:02}.{milliseconds:02}'
 
+def format_times(times):
+    """format_time for a NumPy array of times."""
+    np = vectorized.np
+    times = np.where(times == float('inf'), 0.0, times)
+    return vectorized.clock_strings(
+        (times // 3600).astype(np.int64), ((times % 3600) // 60).astype(np.int64),
+        (times % 60).astype(np.int64), ((times * 100) % 100).astype(np.int64),
+    )
+
 def escape_ass_text(s):
     """Escape specific characters to be compatible with ASS format."""
     return s.replace("{", "｛").replace("}", "｝").replace("\r", "").replace("\n", "")
@@ -73,37 +155,47 @@ def convert2Ass(line):
     """
     Convert a danmu line to ASS dialogue format.
     """
-    # Escape text and set initial ASS string
-    ass_text = escape_ass_text(line['text'])
-
-    # Determine color and styling
-    common_styles = ''
-    rgb = [int(line['color'][i:i+2], 16) for i in range(0, len(line['color']), 2)]  # Convert RRGGBB to [R, G, B]
-    if line['color'] != 'FFFFFF':  # Default white
-        common_styles += f'\\c&H{line["color"][4:6]}{line["color"][2:4]}{line["color"][0:2]}&'  # Change color to &HBBGGRR
-
     # Check if color is considered dark, and set white border for dark colors
+    rgb = [int(line['color'][i:i+2], 16) for i in range(0, len(line['color']), 2)]  # Convert RRGGBB to [R, G, B]
     dark = rgb[0] * 0.299 + rgb[1] * 0.587 + rgb[2] * 0.114 < 0x30
+
+    # Combine all styles
+    styles = effect_styles(line) + common_styles(line['color'], line['size'], dark)
+
+    # Generate the final ASS dialogue line
+    return dialogue_line(format_time(line["stime"]), format_time(line["dtime"]), line['type'], styles, line['text'])
+
+def common_styles(color, size, dark):
+    """Color, border and size overrides of a dialogue line."""
+    styles = ''
+    if color != 'FFFFFF':  # Default white
+        styles += f'\\c&H{color[4:6]}{color[2:4]}{color[0:2]}&'  # Change color to &HBBGGRR
     if dark:
-        common_styles += '\\3c&HFFFFFF'  # White border color
-    if line['size'] != 25:
-        common_styles += f'\\fs{line["size"]}'  # Font size override
+        styles += '\\3c&HFFFFFF'  # White border color
+    if size != 25:
+        styles += f'\\fs{size}'  # Font size override
+    return styles
 
-    # Determine the movement or positioning of the danmu
+def effect_styles(line):
+    """The movement or positioning of the danmu."""
     if line['type'] == 'R2L':
-        effect_styles = f'\\move({line["poss"]["x"]},{line["poss"]["y"]},{line["posd"]["x"]},{line["posd"]["y"]})'
+        return f'\\move({line["poss"]["x"]},{line["poss"]["y"]},{line["posd"]["x"]},{line["posd"]["y"]})'
     elif line['type'] == 'Fix':
-        effect_styles = f'\\pos({line["poss"]["x"]},{line["poss"]["y"]})'
-    else:
-        effect_styles = ''
-
-    # Combine all styles
-    styles = effect_styles + common_styles
+        return f'\\pos({line["poss"]["x"]},{line["poss"]["y"]})'
+    return ''
 
-    # Generate the final ASS dialogue line
-    return f'Dialogue: 0,{format_time(line["stime"])},{format_time(line["dtime"])},{line["type"]},,20,20,2,,{{{styles}}}{ass_text}'
+def dialogue_line(start, end, style, styles, text):
+    return f'Dialogue: 0,{start},{end},{style},,20,20,2,,{{{styles}}}{escape_ass_text(text)}'
 
 def generate_ass(danmu):
+    return ''.join(iter_ass(danmu))
+
+def iter_ass(danmu, presorted=False, progress=True):
+    """
+    Yield the ASS file for `danmu` piece by piece: the header, then one
+    dialogue line per placed danmu. With `presorted`, `danmu` may be any
+    iterable in time order (e.g. iter_xml) and is never held in memory.
+    """
     config['font'] = chose_font(config['fontlist'])
     ass_header_template = """[Script Info]
 Title: DanMuScreen
@@ -124,96 +216,142 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
 """
 
     header_values = {**config, 'alpha': hexAlpha(config['opacity'])}
-    ass_header = ass_header_template.format(**header_values)
-    danmu = set_position(danmu)
-    
-    # Create the ASS content, showing a progress bar while processing
-    ass_lines = []
-    print("Generating ASS content with visual progress:")
-    for line in tqdm(danmu, desc="Processing danmu", unit="line"):
-        ass_lines.append(convert2Ass(line))
+    yield ass_header_template.format(**header_values)
+    if not presorted:
+        danmu = sorted(danmu, key=lambda x: x['time'])
+
+    for line in tqdm(place_danmu(danmu), desc="Generating ASS", unit="line", disable=not progress):
+        yield '\n' + convert2Ass(line)
+
+def iter_ass_numpy(source, progress=True, stats=None):
+    """
+    Same output as iter_ass(iter_xml(source)), but the `p` attributes are
+    decoded and the colors, darkness and times computed as NumPy columns.
+    Layout is sequential and stays in Python. The number of <d> elements read
+    is stored in `stats['danmu']` if given.
+    """
+    np = vectorized.np
+    ps, texts = vectorized.read_danmu(source)
+    if stats is not None:
+        stats['danmu'] = len(ps)
+    try:
+        columns = vectorized.decode_p(ps)
+    except ValueError:
+        # Malformed rows are skipped one by one, as parse_xml does
+        danmu = (parse_attributes(p, text) for p, text in zip(ps, texts))
+        yield from iter_ass([line for line in danmu if line is not None], progress=progress)
+        return
+
+    time = columns[:, 0]
+    mode = columns[:, 1].astype(np.int64)
+    size = columns[:, 2].astype(np.int64)
+    color = columns[:, 3].astype(np.int64) & 0xFFFFFF
+    bottom = columns[:, 5] > 0
+
+    # Rows of unknown modes are never placed; the rest in stable time order
+    rows = np.flatnonzero(np.isin(mode, list(MODE_MAPPING)))
+    rows = rows[np.argsort(time[rows], kind='stable')]
+    color_names = vectorized.hex_colors(color[rows])
+    danmu = (
+        {'text': texts[i], 'time': t, 'mode': MODE_MAPPING[m], 'size': fs, 'color': c, 'bottom': b, 'row': i}
+        for i, t, m, fs, c, b in zip(
+            rows.tolist(), time[rows].tolist(), mode[rows].tolist(), size[rows].tolist(), color_names,
+            bottom[rows].tolist(),
+        )
+    )
+
+    yield next(iter_ass((), presorted=True))  # Header
+    placed = list(tqdm(place_danmu(danmu), desc="Generating ASS", unit="line", disable=not progress))
+    if not placed:
+        return
+    placed_rows = np.array([line['row'] for line in placed])
+    start = format_times(np.array([line['stime'] for line in placed]))
+    end = format_times(np.array([line['dtime'] for line in placed]))
+    dark = vectorized.dark_flags(color[placed_rows]).tolist()
+    for line, start_time, end_time, is_dark in zip(placed, start, end, dark):
+        styles = effect_styles(line) + common_styles(line['color'], line['size'], is_dark)
+        yield '\n' + dialogue_line(start_time, end_time, line['type'], styles, line['text'])
+
+class RowTimeline:
+    """
+    Per pixel row, the time until which the row is taken. Ranges are plain
+    list slices, so a check or update costs one C-level pass over the danmu
+    height and never depends on how many danmu are on screen.
+    """
+    def __init__(self, size):
+        self.rows = [float('-inf')] * max(int(size), 1)
+
+    def update(self, lo, hi, value):
+        # Rows are only taken once they are free, so the new time always
+        # dominates the old one and a plain overwrite is enough.
+        self.rows[lo:hi] = [value] * (hi - lo)
 
-    return ass_header + '\n' + '\n'.join(ass_lines)
+    def query(self, lo, hi):
+        return max(self.rows[lo:hi], default=float('-inf'))
+
+@lru_cache(maxsize=None)
+def candidate_rows(screen_height, height, bottom_margin, prefer_lower=False):
+    """
+    Row positions for danmu of `height`, best first: closest to the middle of
+    the screen, ties broken towards the top (or the bottom with `prefer_lower`).
+    """
+    rows = range(0, screen_height - height - bottom_margin, height + 5)
+    tie_break = -1 if prefer_lower else 1
+    return tuple(sorted(rows, key=lambda i: (abs(screen_height / 2 - i), tie_break * i)))
 
 def normal_danmu(screen_width, screen_height, bottom_margin, duration, max_r):
     """
-    Optimized function to handle right-to-left scrolling danmu placement.
+    Handle right-to-left scrolling danmu placement.
+
+    For every pixel row we keep when the last danmu's tail clears the right
+    edge and when it leaves the screen. A row fits a new danmu once the tail
+    is clear and the new (possibly faster) danmu cannot catch up before the
+    old one leaves. Candidates are tried best first, so placement no longer
+    scans the active danmu.
     """
-    # Track active danmu as a heap-based priority queue for quick removals and additions
-    active_danmu = []
+    tail_free = RowTimeline(screen_height)
+    exit_free = RowTimeline(screen_height)
 
     def add_danmu(appearance_time, width, height, is_bottom_aligned):
-        exit_time = screen_width / (width + screen_width) * duration + appearance_time
-        deactivate_time = duration + appearance_time
-
-        # Clean up expired danmu before adding new ones
-        while active_danmu and active_danmu[0][0] <= appearance_time:
-            heappop(active_danmu)
-
-        # Find the best position by scoring all potential options
-        best_score, best_position = float('-inf'), None
-        for i in range(0, screen_height - height - bottom_margin, height + 5):
-            conflict = any(
-                (danmu_start <= exit_time and appearance_time <= danmu_end and pos <= i < pos + height)
-                for (danmu_end, danmu_start, pos) in active_danmu
-            )
-            if not conflict:
-                # Calculate distance and score
-                distance = abs(screen_height / 2 - i) / screen_height
-                score = 1 - math.sqrt(distance ** 2 / 2)
-                if score > best_score:
-                    best_score, best_position = score, i
-
-        if best_position is not None:
-            heappush(active_danmu, (deactivate_time, appearance_time, best_position))
-            return {'top': best_position, 'time': appearance_time}
+        speed = (width + screen_width) / duration
+        catch_time = screen_width / speed + appearance_time  # Head reaches the left edge
+
+        for i in candidate_rows(screen_height, height, bottom_margin):
+            if (tail_free.query(i, i + height) <= appearance_time and
+                    exit_free.query(i, i + height) <= catch_time):
+                tail_free.update(i, i + height, appearance_time + width / speed)
+                exit_free.update(i, i + height, appearance_time + duration)
+                return {'top': i, 'time': appearance_time}
         return None
 
     return add_danmu
 
 def side_danmu(screen_height, bottom_margin, duration, max_r):
     """
-    Optimized function to handle fixed danmu placement at the top or bottom of the screen.
+    Handle fixed danmu placement at the top or bottom of the screen, tracking
+    per pixel row when the current danmu disappears.
     """
-    # Track active danmu in a deque for efficient insertions and deletions
-    active_danmu = deque()
+    exit_free = RowTimeline(screen_height)
 
     def add_danmu(appearance_time, height, is_top, is_bottom_aligned):
-        exit_time = appearance_time + duration
-
-        # Clean up expired danmu
-        while active_danmu and active_danmu[0][0] <= appearance_time:
-            active_danmu.popleft()
-
-        # Try to place the danmu at either the top or bottom
-        best_score, best_position = float('-inf'), None
-        positions = range(0, screen_height - height - bottom_margin, height + 5)
-        if not is_top:
-            positions = reversed(positions)
-
-        for i in positions:
-            conflict = any(pos <= i < pos + height for _, _, pos in active_danmu)
-            if not conflict:
-                # Calculate score based on distance and alignment
-                distance = abs(screen_height / 2 - i) / screen_height
-                alignment_score = 1 if is_top else 0.5
-                score = 1 - math.sqrt(distance ** 2 * alignment_score)
-                if score > best_score:
-                    best_score, best_position = score, i
-
-        if best_position is not None:
-            active_danmu.append((exit_time, appearance_time, best_position))
-            return {'top': best_position, 'time': appearance_time}
+        for i in candidate_rows(screen_height, height, bottom_margin, prefer_lower=not is_top):
+            if exit_free.query(i, i + height) <= appearance_time:
+                exit_free.update(i, i + height, appearance_time + duration)
+                return {'top': i, 'time': appearance_time}
         return None
 
     return add_danmu
 
 def set_position(danmu):
+    danmu = sorted(danmu, key=lambda x: x['time'])
+    return list(place_danmu(danmu))
+
+def place_danmu(danmu):
+    """Place time-sorted danmu one by one, yielding those that found a spot."""
     normal = normal_danmu(config['playResX'], config['playResY'], config['bottom'], config['r2ltime'], config['max_delay'])
     side = side_danmu(config['playResY'], config['bottom'], config['fixtime'], config['max_delay'])
 
-    danmu = sorted(danmu, key=lambda x: x['time'])
-    for line in tqdm(danmu, desc="Setting danmu position", unit="line"):
+    for line in danmu:
         font_size = round(line['size'] * config['font_size'])
         width = calc_width(line['text'], font_size)
         if line['mode'] == 'R2L':
@@ -225,6 +363,7 @@ def set_position(danmu):
             line['poss'] = {'x': config['playResX'] + width / 2, 'y': pos['top'] + font_size}
             line['posd'] = {'x': -width / 2, 'y': pos['top'] + font_size}
             line['dtime'] = config['r2ltime'] + line['stime']
+            yield line
         elif line['mode'] in ['TOP', 'BOTTOM']:
             is_top = line['mode'] == 'TOP'
             pos = side(line['time'], font_size, is_top, line['bottom'])
@@ -234,9 +373,7 @@ def set_position(danmu):
             line['stime'] = pos['time']
             line['posd'] = line['poss'] = {'x': config['playResX'] / 2, 'y': pos['top'] + font_size}
             line['dtime'] = config['fixtime'] + line['stime']
-
-    filtered = [line for line in danmu if 'dtime' in line and line['dtime'] != float('inf')]
-    return [line for line in filtered if 'stime' in line]
+            yield line
 
 def parse_xml(content):
     """
@@ -244,64 +381,185 @@ def parse_xml(content):
     """
     root = ET.fromstring(content)
     danmu_list = []
-
-    mode_mapping = {1: 'R2L', 2: 'R2L', 3: 'R2L', 4: 'BOTTOM', 5: 'TOP'}
-
     for elem in root.findall('d'):
-        p_attr = elem.get('p')
-        if not p_attr:
-            continue
+        line = parse_element(elem)
+        if line is not None:
+            danmu_list.append(line)
+    return danmu_list
 
-        attributes = p_attr.split(',')
-        if len(attributes) < 6:
+def iter_xml(source):
+    """
+    Like parse_xml, but stream danmu from a file name or binary file object
+    one at a time, clearing parsed elements so memory stays flat.
+    """
+    context = ET.iterparse(source, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag != 'd':
             continue
+        line = parse_element(elem)
+        root.clear()
+        if line is not None:
+            yield line
 
-        try:
-            time = float(attributes[0])
-            mode_index = int(attributes[1])
-            mode = mode_mapping.get(mode_index, 'UNKNOWN')
-            size = int(attributes[2])
-            color_int = int(attributes[3])
-            color = RRGGBB(color_int & 0xFFFFFF)
-            timestamp = int(attributes[4])
-            pool = int(attributes[5])
-            bottom = pool > 0
-        except (ValueError, IndexError):
-            continue
+MODE_MAPPING = {1: 'R2L', 2: 'R2L', 3: 'R2L', 4: 'BOTTOM', 5: 'TOP'}
 
-        text = elem.text or ""
+def parse_element(elem):
+    """Convert one <d> element to a danmu dictionary, or None if it is malformed."""
+    return parse_attributes(elem.get('p'), elem.text)
 
-        line = {
-            'text': text,
-            'time': time,
-            'mode': mode,
-            'size': size,
-            'color': color,
-            'bottom': bottom,
-        }
+def parse_attributes(p_attr, text):
+    if not p_attr:
+        return None
 
-        danmu_list.append(line)
+    attributes = p_attr.split(',')
+    if len(attributes) < 6:
+        return None
 
-    return danmu_list
+    try:
+        time = float(attributes[0])
+        mode_index = int(attributes[1])
+        mode = MODE_MAPPING.get(mode_index, 'UNKNOWN')
+        size = int(attributes[2])
+        color_int = int(attributes[3])
+        color = RRGGBB(color_int & 0xFFFFFF)
+        timestamp = int(attributes[4])
+        pool = int(attributes[5])
+        bottom = pool > 0
+    except (ValueError, IndexError):
+        return None
+
+    text = text or ""
+
+    return {
+        'text': text,
+        'time': time,
+        'mode': mode,
+        'size': size,
+        'color': color,
+        'bottom': bottom,
+    }
+
+def split_content(content, n_chunks):
+    """
+    Split XML content into `n_chunks` well-formed documents, cutting only at
+    <d element boundaries.
+    """
+    first = content.find('<d ')
+    last = content.rfind('</d>')
+    if first < 0 or last < 0:
+        return []
+    last += len('</d>')
+
+    bounds = [first]
+    step = max((last - first) // n_chunks, 1)
+    for i in range(1, n_chunks):
+        cut = content.find('<d ', max(first + i * step, bounds[-1] + 1), last)
+        if cut < 0:
+            break
+        bounds.append(cut)
+    bounds.append(last)
+    return [f'<i>{content[start:end]}</i>' for start, end in zip(bounds, bounds[1:])]
+
+def parse_xml_parallel(content, workers=None):
+    """
+    Parse XML content in a process pool. Chunks are concatenated in document
+    order, so the result is identical to parse_xml.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = split_content(content, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [line for lines in executor.map(parse_xml, chunks) for line in lines]
 
 def write_file(data, filename):
-    with open(filename, 'w', encoding='utf-8') as file:
-        file.write(data)
+    """
+    Write a string or an iterable of strings to `filename`, or stdout for '-'.
+    Lines go to a temporary file that replaces `filename` only once `data` is
+    exhausted, so input that fails to parse halfway leaves no partial output.
+    """
+    if isinstance(data, str):
+        data = (data,)
+    if filename == '-':
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stdout.writelines(data)
+        sys.stdout.flush()
+        return
+    tmp = filename + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8', buffering=1 << 20) as file:
+            file.writelines(data)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, filename)
+
+def convert_file(input_file, output_file, presorted=False, font_file=None, use_numpy=False):
+    """Convert one XML file without progress output; returns the number of danmu read."""
+    config['font_file'] = font_file  # Worker processes may not share our config
+    if use_numpy:
+        stats = {}
+        write_file(iter_ass_numpy(input_file, progress=False, stats=stats), output_file)
+        return stats['danmu']
+    count = 0
+    def counted(lines):
+        nonlocal count
+        for line in lines:
+            count += 1
+            yield line
+    write_file(iter_ass(counted(iter_xml(input_file)), presorted, progress=False), output_file)
+    return count
+
+def info(msg):
+    # Status goes to stderr so the ASS can be written to stdout
+    print(msg, file=sys.stderr)
 
 def main(args):
     parser = argparse.ArgumentParser(description='Convert XML file to ASS format.')
-    parser.add_argument('-i', '--input_file', type=str, required=True, help='Path to the input XML file.')
-    parser.add_argument('-o', '--output_file', type=str, required=True, help='Path to the output ASS file.')
+    parser.add_argument('-i', '--input_file', type=str, nargs='+', required=True, help="Input XML file, '-' for stdin, or directories and globs for batch mode.")
+    parser.add_argument('-o', '--output_file', type=str, default=None, help="Output ASS file, '-' for stdout, or output directory in batch mode (default: next to the input, or stdout for stdin).")
+    parser.add_argument('-j', '--jobs', type=batch.positive_int, default=None, help='Number of parser processes (default 1), or of files converted in parallel in batch mode (default all cores).')
+    parser.add_argument('-f', '--force', action='store_true', help='In batch mode, convert even if the output is newer than the input.')
+    parser.add_argument('--font_file', type=str, default=None, help='Font file to measure text widths with (needs fontTools).')
+    parser.add_argument('--presorted', action='store_true', help='Input is in time order; stream it without holding it in memory.')
+    parser.add_argument('--numpy', action='store_true', help='Decode with the NumPy fast path (needs NumPy, reads the whole file at once).')
     args = parser.parse_args(args)
-
-    with open(args.input_file, 'r', encoding='utf-8') as f:
-        danmu_xml = f.read()
-    danmu = parse_xml(danmu_xml)
-    print(f'Parsed {len(danmu)} lines.')
-    ass_content = generate_ass(danmu)
-    print(f"Generated {len(ass_content)} lines.")
-    write_file(ass_content, args.output_file)
-    print('Done.')
+    config['font_file'] = args.font_file
+    if args.numpy and not vectorized.available():
+        parser.error('--numpy needs NumPy installed')
+    if args.numpy and args.presorted:
+        parser.error('--numpy reads the whole file, so it cannot stream --presorted input')
+    use_numpy = args.numpy
+
+    if args.input_file != ['-'] and batch.is_batch(args.input_file):
+        convert = functools.partial(
+            convert_file, presorted=args.presorted, font_file=args.font_file, use_numpy=use_numpy,
+        )
+        failed = batch.run_batch(convert, args.input_file, args.output_file, args.jobs, args.force)
+        sys.exit(1 if failed else 0)
+    args.input_file = args.input_file[0]
+    if args.output_file is None:
+        # Standard input has no name to put the output next to
+        args.output_file = '-' if args.input_file == '-' else batch.output_path(args.input_file)
+
+    source = sys.stdin.buffer if args.input_file == '-' else args.input_file
+    if args.jobs not in (None, 1):
+        # Parallel parsing splits the whole document, so it is read at once
+        if args.input_file == '-':
+            danmu_xml = source.read().decode('utf-8')
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                danmu_xml = f.read()
+        danmu = parse_xml_parallel(danmu_xml, args.jobs)
+        info(f'Parsed {len(danmu)} lines.')
+        ass = iter_ass(danmu)
+    elif use_numpy:
+        ass = iter_ass_numpy(source)
+    else:
+        # Layout needs time order, so unsorted input is collected and sorted
+        # once; everything after that is streamed.
+        ass = iter_ass(iter_xml(source), presorted=args.presorted)
+    write_file(ass, args.output_file)
+    info('Done.')
 
 if __name__ == '__main__':
     main(sys.argv[1:])
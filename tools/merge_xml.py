@@ -2,6 +2,19 @@ import os
 import sys
 import xml.etree.ElementTree as ET
 import argparse
+import hashlib
+import heapq
+import tempfile
+import shutil
+import json
+import mmap
+import bisect
+import re
+from array import array
+
+ARCHIVE_HEADER = "<?xml version='1.0' encoding='utf-8'?>\n<root>\n"
+ARCHIVE_FOOTER = '</root>\n'
+P_TIME = re.compile(r' p="([^,"]*)')
 
 def format_value(value):
     if value >= 1E3:
@@ -11,60 +24,379 @@ def format_value(value):
     else:
         return str(value)
 
-def merge_xml_files(input_dir, output_file):
+def danmu_hash(elem):
+    """64-bit hash of the fields that identify a comment across backups."""
+    p = elem.get('p', '').split(',')
+    key = ','.join(p[i] if i < len(p) else '' for i in (0, 1, 3, 6, 7))
+    digest = hashlib.blake2b(f"{key},{elem.text or ''}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit hashes."""
+    def __init__(self, size_bytes, n_hashes=7):
+        self.bits = bytearray(size_bytes)
+        self.n_bits = size_bytes * 8
+        self.n_hashes = n_hashes
+
+    def add(self, value):
+        """Add `value`; returns True if it was (probably) already present."""
+        # Double hashing from the two halves of the 64-bit hash
+        h1, h2 = value & 0xFFFFFFFF, (value >> 32) | 1
+        present = True
+        for i in range(self.n_hashes):
+            bit = (h1 + i * h2) % self.n_bits
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        return present
+
+def write_run(run_dir, entries, run_id):
+    """Sort `entries` of (time, hash, line) and write them to a run file."""
+    entries.sort(key=lambda entry: entry[0])
+    path = os.path.join(run_dir, f'run{run_id}.txt')
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        write_entries(f, entries)
+    return path
+
+def write_entries(f, entries):
+    for time, value, line in entries:
+        f.write(f"{time!r}\t{value}\t{line}\n")
+
+def read_run(path):
+    with open(path, encoding='utf-8', newline='\n') as f:
+        for line in f:
+            time, value, elem = line.rstrip('\n').split('\t', 2)
+            yield float(time), int(value), elem
+
+def split_runs(xml_path, run_dir, run_size, first_run_id):
+    """Stream one input into sorted run files of at most `run_size` comments."""
+    runs, entries = [], []
+    context = ET.iterparse(xml_path, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag != 'd':
+            continue
+        elem.tail = None
+        # One element per line; the only raw line breaks can be in the text
+        line = ET.tostring(elem, encoding='unicode').replace('\n', '&#10;').replace('\r', '&#13;')
+        entries.append((float(elem.get('p').split(',')[0]), danmu_hash(elem), line))
+        root.clear()
+        if len(entries) >= run_size:
+            runs.append(write_run(run_dir, entries, first_run_id + len(runs)))
+            entries = []
+    if entries:
+        runs.append(write_run(run_dir, entries, first_run_id + len(runs)))
+    return runs
+
+def merge_runs(paths):
+    return heapq.merge(*(read_run(path) for path in paths), key=lambda entry: entry[0])
+
+def list_xml_files(input_dir):
     # Check if the input directory exists
     if not os.path.isdir(input_dir):
         raise ValueError(f"The specified directory '{input_dir}' does not exist.")
 
-    # Create root element for the merged XML
-    root = ET.Element('root')
-    seen_elements = set()  # To store unique identifiers of elements
-    elements_set = []  # To keep a list of elements for sorting
-
-    # Iterate through XML files in the directory
-    xml_files = [f for f in os.listdir(input_dir) if f.endswith('.xml')]
+    xml_files = sorted(f for f in os.listdir(input_dir) if f.endswith('.xml'))
 
     # Check if there are XML files in the input directory
     if not xml_files:
         raise ValueError(f"No XML files found in the specified directory '{input_dir}'.")
+    return xml_files
 
-    total_xml_files = len(xml_files)
-    merged_count = 0  # Counter for merged `<d>` elements
+def read_inputs(input_dir, xml_files, run_dir, run_size, fan_in):
+    """Split every input into sorted runs, merged down to at most `fan_in` files."""
+    runs = []
     for i, xml_file in enumerate(xml_files):
-        print(f"Merging XML file {i+1} of {total_xml_files}: {xml_file}", end='\r')
+        print(f"Reading XML file {i+1} of {len(xml_files)}: {xml_file}", end='\r')
         xml_path = os.path.join(input_dir, xml_file)
         try:
-            tree = ET.parse(xml_path)
-            root_element = tree.getroot()
-            for elem in root_element.findall(".//d"):
-                elem_id = ET.tostring(elem, encoding='unicode')
-                if elem_id not in seen_elements:
-                    seen_elements.add(elem_id)
-                    elements_set.append(elem)   # Store the element itself
-                    merged_count += 1
-
+            runs += split_runs(xml_path, run_dir, run_size, len(runs))
         except ET.ParseError:
             print(f"Warning: '{xml_file}' is not a valid XML file and was skipped.")
+    print()
+
+    # Reduce the number of runs so that no more than fan_in files are open
+    run_id = len(runs)
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            path = os.path.join(run_dir, f'run{run_id}.txt')
+            run_id += 1
+            with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                write_entries(f, merge_runs(runs[start:start + fan_in]))
+            for old in runs[start:start + fan_in]:
+                os.remove(old)
+            merged.append(path)
+        runs = merged
+    return runs
+
+class Deduplicator:
+    """
+    Drops duplicates from a time-sorted stream of (time, hash, line) entries.
+
+    Duplicates always share their time, so by default only the hashes of the
+    current timestamp are kept. With `bloom_mb`, a Bloom filter of that size
+    dedups across all times instead, at the cost of rare false positives.
+    Hashes found in `index` (an already merged archive) are dropped too.
+    """
+    def __init__(self, bloom_mb=0, index=None):
+        self.bloom = BloomFilter(int(bloom_mb * 1024 * 1024)) if bloom_mb else None
+        self.index = index
+        self.duplicates = 0
+
+    def filter(self, entries):
+        current_time, seen = None, set()
+        for entry in entries:
+            time, value, line = entry
+            if self.bloom is not None:
+                duplicate = self.bloom.add(value)
+            else:
+                if time != current_time:
+                    current_time, seen = time, set()
+                duplicate = value in seen
+                seen.add(value)
+            if duplicate or (self.index is not None and value in self.index):
+                self.duplicates += 1
+                continue
+            yield entry
+
+def write_archive(output_file, entries, keep_tmp=False):
+    """
+    Write entries as an XML file with one <d> per line; returns their count.
+    The file is written to `<output>.tmp` and only renamed over `output_file`
+    once complete, so a failed merge leaves the previous output in place.
+    With `keep_tmp` the caller moves it into place instead.
+    """
+    count = 0
+    tmp_path = output_file + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(ARCHIVE_HEADER)
+            for time, value, line in entries:
+                f.write(line)
+                f.write('\n')
+                count += 1
+            f.write(ARCHIVE_FOOTER)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    if not keep_tmp:
+        os.replace(tmp_path, output_file)
+    return count
+
+def merge_xml_files(input_dir, output_file, run_size=100000, fan_in=64, bloom_mb=0):
+    """
+    Merge every XML file in `input_dir` into `output_file`, sorted by time and
+    without duplicates, in memory bounded by `run_size` comments.
+
+    Each input is split into sorted run files, which are combined with
+    heapq.merge, at most `fan_in` at a time. See Deduplicator for `bloom_mb`.
+    """
+    xml_files = list_xml_files(input_dir)
+    with tempfile.TemporaryDirectory(prefix='merge_xml_') as run_dir:
+        runs = read_inputs(input_dir, xml_files, run_dir, run_size, fan_in)
+        dedup = Deduplicator(bloom_mb)
+        merged_count = write_archive(output_file, dedup.filter(merge_runs(runs)))
+
+    print(f'Successfully merged {len(xml_files)} XML files into {output_file}.')
+    print(f'{format_value(merged_count)} elements were merged, {format_value(dedup.duplicates)} duplicates removed.')
+
+class HashIndex:
+    """
+    Sorted 64-bit hashes of every comment in a merged archive, stored as raw
+    little-endian integers in `<output>.index` and searched in place via mmap.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = self.mmap = None
+        self.hashes = ()
+        if os.path.getsize(path):
+            self.file = open(path, 'rb')
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.hashes = memoryview(self.mmap).cast('Q')
 
-    sorted_elements = sorted(elements_set, key=lambda x: float(x.attrib['p'].split(',')[0]))
-    for elem in sorted_elements:
-        root.append(elem)
+    def __contains__(self, value):
+        i = bisect.bisect_left(self.hashes, value)
+        return i < len(self.hashes) and self.hashes[i] == value
 
-    # Write the merged XML to the output file
-    merged_tree = ET.ElementTree(root)
-    merged_tree.write(output_file, encoding='utf-8', xml_declaration=True)
-    
-    print(f'\nSuccessfully merged {len(xml_files)} XML files into {output_file}.')
-    print(f'{format_value(merged_count)} elements were merged.')
+    def close(self):
+        if self.mmap is not None:
+            self.hashes.release()
+            self.mmap.close()
+            self.file.close()
+
+    @staticmethod
+    def write(path, old_path, new_hashes):
+        """Write the union of the index at `old_path` (if any) and `new_hashes` to `path`."""
+        old = HashIndex(old_path) if old_path else None
+        try:
+            with open(path, 'wb') as f:
+                chunk = array('Q')
+                for value in heapq.merge(old.hashes if old else (), sorted(new_hashes)):
+                    chunk.append(value)
+                    if len(chunk) >= 65536:
+                        chunk.tofile(f)
+                        chunk = array('Q')
+                chunk.tofile(f)
+        finally:
+            if old is not None:
+                old.close()
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def line_time(line):
+    return float(P_TIME.search(line).group(1))
+
+def archive_last_time(output_file):
+    """Time of the last comment in a merged archive, or None if there is none."""
+    with open(output_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 65536, 0))
+        lines = f.read().split(b'\n')
+    for line in reversed(lines[1:]):
+        if line.startswith(b'<d '):
+            return line_time(line.decode('utf-8'))
+    return None
+
+def read_archive(output_file):
+    with open(output_file, encoding='utf-8', newline='\n') as f:
+        for line in f:
+            if line.startswith('<d '):
+                line = line.rstrip('\n')
+                yield line_time(line), 0, line
+
+def read_manifest(output_file, manifest_path, index_path):
+    """
+    The inputs recorded in the manifest, or None if the archive and index are
+    missing or are not the ones the manifest was written with (e.g. after an
+    interrupted run), in which case everything has to be merged again.
+    """
+    if not all(os.path.isfile(path) for path in (output_file, manifest_path, index_path)):
+        return None
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('archive') != file_stamp(output_file) or manifest.get('index') != file_stamp(index_path):
+        return None
+    return manifest['files']
+
+def merge_incremental(input_dir, output_file, run_size=100000, fan_in=64, bloom_mb=0):
+    """
+    Merge only the inputs that are new or changed since the last run into an
+    archive written by this function.
+
+    Next to `output_file`, `<output>.manifest.json` records the merged inputs
+    by name, size and mtime, and a HashIndex holds the hashes of the archived
+    comments for deduplication. See Deduplicator for `bloom_mb`.
+
+    Only the new inputs are parsed, sorted and deduplicated. The archive and
+    the index are still rewritten in full on every run, as sequential copies
+    that do not parse the archive: new comments that all come after the
+    archive are appended to a copy of it, otherwise (the usual case, as
+    times are relative to the video) its lines are merged with the new ones.
+    So a run costs O(new comments log new comments) CPU plus O(archive) I/O.
+
+    The archive, index and manifest are written as temporary files and moved
+    into place in that order. The manifest records the archive and index it
+    belongs to, so a run interrupted between the moves merges from scratch.
+    """
+    manifest_path, index_path = output_file + '.manifest.json', output_file + '.index'
+    manifest = read_manifest(output_file, manifest_path, index_path)
+    if manifest is None:
+        print(f'No valid merge index found for {output_file}, merging from scratch.')
+        manifest = {}
+
+    xml_files = list_xml_files(input_dir)
+    stamps = {f: file_stamp(os.path.join(input_dir, f)) for f in xml_files}
+    new_files = [f for f in xml_files if manifest.get(f) != stamps[f]]
+    if not new_files:
+        print(f'{output_file} is up to date.')
+        return
+
+    archive_tmp, index_tmp, manifest_tmp = (path + '.tmp' for path in (output_file, index_path, manifest_path))
+    with tempfile.TemporaryDirectory(prefix='merge_xml_') as run_dir:
+        runs = read_inputs(input_dir, new_files, run_dir, run_size, fan_in)
+        index = HashIndex(index_path) if manifest else None
+        dedup = Deduplicator(bloom_mb, index)
+        new_path = os.path.join(run_dir, 'new.txt')
+        new_hashes = array('Q')
+        first_time = None
+        try:
+            with open(new_path, 'w', encoding='utf-8', newline='\n') as f:
+                for entry in dedup.filter(merge_runs(runs)):
+                    if first_time is None:
+                        first_time = entry[0]
+                    new_hashes.append(entry[1])
+                    write_entries(f, (entry,))
+        finally:
+            if index is not None:
+                index.close()
+
+        if not manifest:
+            write_archive(output_file, read_run(new_path), keep_tmp=True)
+        elif not new_hashes:
+            # Nothing new to archive; only the manifest changes
+            archive_tmp, index_tmp = output_file, index_path
+        else:
+            last_time = archive_last_time(output_file)
+            if last_time is None or first_time >= last_time:
+                # Everything is newer: replace the footer of a copy with the new lines
+                shutil.copyfile(output_file, archive_tmp)
+                with open(archive_tmp, 'rb+') as f:
+                    f.seek(-len(ARCHIVE_FOOTER), os.SEEK_END)
+                    if f.read() != ARCHIVE_FOOTER.encode('utf-8'):
+                        os.remove(archive_tmp)
+                        raise ValueError(f"'{output_file}' was not written by merge_xml.py.")
+                    f.seek(-len(ARCHIVE_FOOTER), os.SEEK_END)
+                    f.truncate()
+                with open(archive_tmp, 'a', encoding='utf-8', newline='\n') as f:
+                    for time, value, line in read_run(new_path):
+                        f.write(line)
+                        f.write('\n')
+                    f.write(ARCHIVE_FOOTER)
+            else:
+                write_archive(output_file, heapq.merge(
+                    read_archive(output_file), read_run(new_path), key=lambda entry: entry[0]
+                ), keep_tmp=True)
+
+    if index_tmp != index_path:
+        HashIndex.write(index_tmp, index_path if manifest else None, new_hashes)
+    manifest.update((f, stamps[f]) for f in new_files)
+    with open(manifest_tmp, 'w', encoding='utf-8') as f:
+        # A rename keeps size and mtime, so these stamps hold once moved
+        json.dump({'files': manifest, 'archive': file_stamp(archive_tmp), 'index': file_stamp(index_tmp)}, f, indent=1)
+    if archive_tmp != output_file:
+        os.replace(archive_tmp, output_file)
+        os.replace(index_tmp, index_path)
+    os.replace(manifest_tmp, manifest_path)
+
+    print(f'Successfully merged {len(new_files)} new XML files into {output_file}.')
+    print(f'{format_value(len(new_hashes))} elements were merged, {format_value(dedup.duplicates)} duplicates removed.')
+
+def bloom_size(value):
+    """argparse type for --bloom_mb: 0 to disable, otherwise at least one byte."""
+    mb = float(value)
+    if mb != 0 and not mb * 1024 * 1024 >= 1:
+        raise argparse.ArgumentTypeError(f'must be 0 or at least one byte ({1 / 1024 / 1024:.1e} MB), got {value}')
+    return mb
 
 def main(args):
     parser = argparse.ArgumentParser(description='Merge multiple XML files into a single XML file.')
     parser.add_argument('-i', '--input_dir', type=str, required=True, help='Directory containing XML files to merge.')
     parser.add_argument('-o', '--output_file', type=str, required=True, help='Path for the output merged XML file.')
+    parser.add_argument('--run_size', type=int, default=100000, help='Comments held in memory per sorted run.')
+    parser.add_argument('--fan_in', type=int, default=64, help='Maximum number of runs merged at once.')
+    parser.add_argument('--incremental', action='store_true', help='Only merge inputs that are new since the last run, keeping an index next to the output.')
+    parser.add_argument('--bloom_mb', type=bloom_size, default=0, help='Deduplicate across all times with a Bloom filter of this many MB.')
     args = parser.parse_args(args)
 
     # Call the function to merge XML files
-    merge_xml_files(args.input_dir, args.output_file)
+    if args.incremental:
+        merge_incremental(args.input_dir, args.output_file, args.run_size, args.fan_in, args.bloom_mb)
+    else:
+        merge_xml_files(args.input_dir, args.output_file, args.run_size, args.fan_in, args.bloom_mb)
 
 if __name__ == '__main__':
     main(sys.argv[1:])
@@ -1,7 +1,10 @@
 import os
 import sys
+import functools
 import xml.etree.ElementTree as ET
 import argparse
+import batch
+import vectorized
 
 
 def format_time_ass(seconds):
@@ -47,22 +50,11 @@ def bilibili_ass(event, log):
     return f"Dialogue: 0,{start_time},{end_time},{style_name},,20,20,2,,{text}"
 
 
-def convert_xml_to_ass(input_file, output_file, style_name="Default"):
-    # Check if the input file exists
-    if not os.path.isfile(input_file):
-        print(f"Error: Input file '{input_file}' does not exist.")
-        return
-    
-    # Parse the XML file
-    try:
-        tree = ET.parse(input_file)
-        root = tree.getroot()
-    except ET.ParseError as e:
-        print(f"Error: Failed to parse XML file '{input_file}'. {e}")
-        return
-    
-    # Create the header for the ASS file
-    header = f"""
+# Mode: (style, duration) for the modes bilibili_ass understands
+STYLES = {1: ("R2L", 8), 4: ("Bottom", 4), 5: ("Top", 4), 6: ("L2R", 8)}
+
+def ass_header(style_name):
+    return f"""
 [Script Info]
 Title: Converted from XML
 ScriptType: v4.00+
@@ -79,6 +71,67 @@ Style: {style_name},黑体,25,&H66FFFFFF,&H66FFFFFF,&H66000000,&H66000000,1,0,0,
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
 """
 
+def format_times_ass(seconds):
+    """format_time_ass for a NumPy array of times."""
+    np = vectorized.np
+    rest = seconds % 60
+    return vectorized.clock_strings(
+        (seconds // 3600).astype(np.int64), ((seconds % 3600) // 60).astype(np.int64),
+        rest.astype(np.int64), ((rest - np.trunc(rest)) * 100).astype(np.int64),
+    )
+
+def convert_xml_to_ass_numpy(input_file, output_file, style_name="Default"):
+    """
+    convert_xml_to_ass with the times of all events decoded and formatted as
+    NumPy columns. Events of modes without a style are skipped.
+    """
+    np = vectorized.np
+    ps, texts = vectorized.read_danmu(input_file)
+    columns = vectorized.decode_p(ps, 2)
+    start = columns[:, 0]
+    mode = columns[:, 1].astype(np.int64)
+
+    rows = np.flatnonzero(np.isin(mode, list(STYLES)))
+    names = {code: name for code, (name, _) in STYLES.items()}
+    durations = np.zeros(max(STYLES) + 1)
+    for code, (_, duration) in STYLES.items():
+        durations[code] = duration
+    start, mode = start[rows], mode[rows]
+    start_times = format_times_ass(start)
+    end_times = format_times_ass(start + durations[mode])
+
+    dialogues = [
+        f"Dialogue: 0,{start_time},{end_time},{names[code]},,20,20,2,,{texts[i]}"
+        for i, code, start_time, end_time in zip(rows.tolist(), mode.tolist(), start_times, end_times)
+    ]
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(ass_header(style_name).strip() + '\n' + '\n'.join(dialogues))
+
+    print(f"Successfully converted '{input_file}' to '{output_file}'.")
+    return len(dialogues)
+
+def convert_xml_to_ass(input_file, output_file, style_name="Default", use_numpy=False):
+    # Check if the input file exists
+    if not os.path.isfile(input_file):
+        print(f"Error: Input file '{input_file}' does not exist.")
+        return
+    if use_numpy:
+        try:
+            return convert_xml_to_ass_numpy(input_file, output_file, style_name)
+        except ValueError:
+            pass  # Malformed attributes, handled event by event below
+    
+    # Parse the XML file
+    try:
+        tree = ET.parse(input_file)
+        root = tree.getroot()
+    except ET.ParseError as e:
+        print(f"Error: Failed to parse XML file '{input_file}'. {e}")
+        return
+    
+    # Create the header for the ASS file
+    header = ass_header(style_name)
+
     # List to hold formatted dialogue lines
     dialogues = []
     
@@ -101,16 +154,26 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         f.write(header.strip() + '\n' + '\n'.join(dialogues))
 
     print(f"Successfully converted '{input_file}' to '{output_file}'.")
+    return len(dialogues)
 
 
 def main(args):
     parser = argparse.ArgumentParser(description='Convert XML file to ASS format.')
-    parser.add_argument('-i', '--input_file', type=str, required=True, help='Path to the input XML file.')
-    parser.add_argument('-o', '--output_file', type=str, required=True, help='Path to the output ASS file.')
+    parser.add_argument('-i', '--input_file', type=str, nargs='+', required=True, help='Input XML file, or directories and globs for batch mode.')
+    parser.add_argument('-o', '--output_file', type=str, default=None, help='Output ASS file, or output directory in batch mode (default: next to the input).')
     parser.add_argument('-s', '--style', type=str, default='Default', help='Style name to use for the output ASS file.')
+    parser.add_argument('-j', '--jobs', type=batch.non_negative_int, default=0, help='Files converted in parallel in batch mode (0 for all cores).')
+    parser.add_argument('-f', '--force', action='store_true', help='Convert even if the output is newer than the input.')
+    parser.add_argument('--numpy', action='store_true', help='Decode with the NumPy fast path (needs NumPy).')
     args = parser.parse_args(args)
-
-    convert_xml_to_ass(args.input_file, args.output_file, args.style)
+    if args.numpy and not vectorized.available():
+        parser.error('--numpy needs NumPy installed')
+    use_numpy = args.numpy
+
+    if batch.is_batch(args.input_file):
+        convert = functools.partial(convert_xml_to_ass, style_name=args.style, use_numpy=use_numpy)
+        sys.exit(1 if batch.run_batch(convert, args.input_file, args.output_file, args.jobs, args.force) else 0)
+    convert_xml_to_ass(args.input_file[0], args.output_file or batch.output_path(args.input_file[0]), args.style, use_numpy)
 
 if __name__ == '__main__':
     main(sys.argv[1:])